@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group, User
 from django.contrib.admin.sites import NotRegistered
-from .models import CoffeeShop, Worker, Shift, UserProfile, ShopAdmin, ShiftRequest, HelpItem
+from django.utils import timezone
+from .models import CoffeeShop, ShopRate, Worker, Shift, UserProfile, ShopAdmin, ShiftRequest, HelpItem
+from .rates import record_rate
 
 # Register your models here.
 try:
@@ -15,10 +17,26 @@ class HelpItemAdmin(admin.ModelAdmin):
     list_filter = ['category', 'item_type']
     search_fields = ['title', 'content']
 
+class ShopRateInline(admin.TabularInline):
+    model = ShopRate
+    extra = 0
+
 @admin.register(CoffeeShop)
 class CoffeeShopAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug', 'short_code', 'minimum_workers', 'hourly_rate']
     prepopulated_fields = {'slug': ('name',)}
+    inlines = [ShopRateInline]
+
+    def save_model(self, request, obj, form, change):
+        obj._defer_rate_record = True
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        today = timezone.localdate()
+        edited = [rate for formset in formsets for rate in formset.new_objects + [obj for obj, _ in formset.changed_objects]]
+        if not any(isinstance(rate, ShopRate) and rate.effective_from == today for rate in edited):
+            record_rate(form.instance)
 
 @admin.register(Worker)
 class WorkerAdmin(admin.ModelAdmin):
@@ -7,6 +7,8 @@ class MainConfig(AppConfig):
 
     def ready(self):
         import os
+        from . import checks, signals  # noqa: F401
         if os.environ.get('RUN_MAIN') == 'true':
-            from . import scheduler
+            from . import push, scheduler
             scheduler.start()
+            push.start()
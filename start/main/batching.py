@@ -0,0 +1,17 @@
+from functools import partial
+from django.db import connection, transaction
+
+def _flush(pending, func):
+    items = pending.pop(func, None)
+    if items:
+        func(items)
+
+def on_commit(func, items):
+    # Django swaps run_on_commit for a new list on every commit and rollback,
+    # so the list identifies the transaction a batch belongs to.
+    batch = getattr(connection, '_on_commit_batch', None)
+    if batch is None or batch[0] is not connection.run_on_commit:
+        batch = connection._on_commit_batch = (connection.run_on_commit, {})
+    pending = batch[1]
+    pending.setdefault(func, set()).update(items)
+    transaction.on_commit(partial(_flush, pending, func))
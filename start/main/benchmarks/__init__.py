@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from django.db import connection
+from django.test import override_settings
+
+SUITES = {}
+
+def suite(name):
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def scratch_cache(location='benchmark'):
+    return override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location},
+    })
+
+@contextmanager
+def scratch_database():
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        test_settings['NAME'] = path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with scratch_cache():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+
+def load_suites():
+    from . import coverage, middleware, notifications, push, views  # noqa: F401
+    return SUITES
@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+from main.models import Shift
+from main.coverage import count_coverage, build_days_info
+from . import suite, timed
+
+SHOP_ID = 1
+OTHER_SHOP_ID = 2
+WORKERS = 30
+
+def make_shifts(days):
+    shifts = []
+    for day in days:
+        for worker_id in range(1, WORKERS + 1):
+            if (worker_id + day.toordinal()) % 3 == 0:
+                continue
+            another = OTHER_SHOP_ID if worker_id % 7 == 0 else None
+            shifts.append(Shift(worker_id=worker_id, coffee_shop_id=SHOP_ID, another_shop_id=another, date=day))
+    return shifts
+
+def quadratic_days_info(days, shifts):
+    by_day_worker = {(s.worker_id, s.date): s for s in shifts}
+    return [
+        sum(1 for (_, d), s in by_day_worker.items() if d == day and (s.another_shop_id is None or s.another_shop_id == SHOP_ID))
+        for day in days
+    ]
+
+@suite('coverage')
+def run(stdout, months=(1, 3, 6, 12)):
+    start = date(2025, 1, 1)
+    stdout.write(f"{'months':>6} {'shifts':>7} {'single-pass, ms':>16} {'us/shift':>9} {'old scan, ms':>13}")
+    for m in months:
+        days = [start + timedelta(days=i) for i in range(m * 30)]
+        shifts = make_shifts(days)
+        single = timed(lambda: build_days_info(days, count_coverage(shifts, SHOP_ID), 4))
+        old = timed(lambda: quadratic_days_info(days, shifts), repeat=1)
+        stdout.write(f"{m:>6} {len(shifts):>7} {single * 1000:>16.2f} {single * 1e6 / len(shifts):>9.3f} {old * 1000:>13.1f}")
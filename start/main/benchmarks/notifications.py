@@ -0,0 +1,129 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.utils import timezone
+from py_vapid import Vapid
+from main.models import CoffeeShop, PushMessage, PushSubscriptions, ShopAdmin, UserProfile
+from main.push import PushDeliveryService, PushSender
+from main.push_standin import StandInPushService
+from main.utils import send_push_notification, send_push_to_admin
+from . import scratch_database, suite
+
+SHOPS = 10
+ADMINS_PER_SHOP = 3
+SUPER_ADMINS = 3
+ADMIN_DEVICES = 2
+WORKERS = 200
+CALLS = 200
+LATENCY = 0.02
+GONE_RATE = 0.01
+THROTTLE_RATE = 0.01
+ERROR_RATE = 0.01
+DELIVERY_WORKERS = 16
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def populate(service):
+    shops = CoffeeShop.objects.bulk_create([
+        CoffeeShop(name=f'Bench {n}', slug=f'bench-{n}', short_code=f'B{n}') for n in range(SHOPS)
+    ])
+    roles = (
+        [('SUPER_ADMIN', None)] * SUPER_ADMINS
+        + [('SHOP_ADMIN', shop) for shop in shops for _ in range(ADMINS_PER_SHOP)]
+        + [('WORKER', None)] * WORKERS
+    )
+    users = User.objects.bulk_create([User(username=f'bench{n}') for n in range(len(roles))])
+    UserProfile.objects.bulk_create([UserProfile(user=user, role=role) for user, (role, _) in zip(users, roles)])
+    ShopAdmin.objects.bulk_create([
+        ShopAdmin(user=user, coffee_shop=shop) for user, (_, shop) in zip(users, roles) if shop is not None
+    ])
+    subscriptions = []
+    for user, (role, _) in zip(users, roles):
+        for _ in range(1 if role == 'WORKER' else ADMIN_DEVICES):
+            info = service.subscribe()
+            subscriptions.append(PushSubscriptions(
+                user=user, endpoint=info['endpoint'], auth=info['keys']['auth'], p256dh=info['keys']['p256dh'],
+            ))
+    PushSubscriptions.objects.bulk_create(subscriptions)
+    workers = [user for user, (role, _) in zip(users, roles) if role == 'WORKER']
+    return shops, workers, len(subscriptions)
+
+def measure_calls(calls):
+    durations = []
+    started = time.perf_counter()
+    for call in calls:
+        call_started = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - call_started)
+    return len(calls) / (time.perf_counter() - started), durations
+
+class TimedSender(PushSender):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = []
+
+    def send(self, subscription, payload):
+        started = time.perf_counter()
+        try:
+            return super().send(subscription, payload)
+        finally:
+            self.durations.append(time.perf_counter() - started)
+
+@suite('notifications')
+def run(stdout):
+    service = StandInPushService(
+        latency=LATENCY, gone_rate=GONE_RATE, throttle_rate=THROTTLE_RATE, error_rate=ERROR_RATE, seed=1,
+    ).start()
+    with scratch_database():
+        shops, workers, subscriptions = populate(service)
+        stdout.write(
+            f'{SHOPS} shops x {ADMINS_PER_SHOP} admins + {SUPER_ADMINS} super admins ({ADMIN_DEVICES} devices each), '
+            f'{WORKERS} workers, {subscriptions} subscriptions'
+        )
+        stdout.write(f"{'call':<36} {'calls/s':>8} {'p50, ms':>8} {'p99, ms':>8} {'queued':>7}")
+        cases = [
+            ('send_push_notification', [
+                lambda user=workers[n % WORKERS]: send_push_notification(user, 'Смена', 'Тест', '/bench/')
+                for n in range(CALLS)
+            ]),
+            ('send_push_to_admin', [
+                lambda shop=shops[n % SHOPS]: send_push_to_admin('Заявка', 'Тест', '/bench/', coffee_shop=shop, with_super_admins=True)
+                for n in range(CALLS)
+            ]),
+            ('send_push_to_admin, topic digest', [
+                lambda shop=shops[n % SHOPS]: send_push_to_admin(
+                    'Заявка', f'Тест {n}', '/bench/', coffee_shop=shop, with_super_admins=True, topic=f'bench:{shop.id}',
+                )
+                for n in range(CALLS)
+            ]),
+        ]
+        for name, calls in cases:
+            before = PushMessage.objects.count()
+            calls_per_second, durations = measure_calls(calls)
+            queued = PushMessage.objects.count() - before
+            stdout.write(
+                f'{name:<36} {calls_per_second:>8.1f} {percentile(durations, 0.5) * 1000:>8.2f} '
+                f'{percentile(durations, 0.99) * 1000:>8.2f} {queued:>7}'
+            )
+
+        PushMessage.objects.update(available_at=timezone.now())
+        vapid = Vapid()
+        vapid.generate_keys()
+        sender = TimedSender(vapid_key=vapid, admin_email='bench@example.com', pool_size=DELIVERY_WORKERS)
+        with ThreadPoolExecutor(max_workers=DELIVERY_WORKERS) as pool:
+            delivery = PushDeliveryService(workers=DELIVERY_WORKERS, pool=pool, sender=sender)
+            started = time.perf_counter()
+            while delivery.drain_once():
+                pass
+            elapsed = time.perf_counter() - started
+        sender.close()
+
+        statuses = ', '.join(f'{status}: {count}' for status, count in sorted(service.stats.items()))
+        stdout.write(
+            f'delivery, {DELIVERY_WORKERS} threads, {LATENCY * 1000:.0f} ms latency: '
+            f'{len(sender.durations) / elapsed:.1f} msg/s, p99 send {percentile(sender.durations, 0.99) * 1000:.1f} ms'
+        )
+        stdout.write(f'stand-in responses: {statuses}; waiting for retry: {PushMessage.objects.count()}')
+    service.stop()
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from py_vapid import Vapid
+from pywebpush import webpush
+from main.push import PushSender
+from main.push_standin import StandInPushService, b64
+from . import suite
+
+MESSAGES = 200
+ORIGINS = 2
+LATENCY = 0.01
+WORKERS = 16
+
+def make_subscriptions(services, count):
+    subscriptions = []
+    for n in range(count):
+        info = services[n % len(services)].subscribe()
+        subscriptions.append(SimpleNamespace(endpoint=info['endpoint'], **info['keys']))
+    return subscriptions
+
+def legacy_send(subscriptions, private_key):
+    for sub in subscriptions:
+        webpush(
+            subscription_info={"endpoint": sub.endpoint, "keys": {"auth": sub.auth, "p256dh": sub.p256dh}},
+            data='{"title": "bench"}',
+            vapid_private_key=private_key,
+            vapid_claims={"sub": "mailto:bench@example.com"},
+            ttl=3600,
+        )
+
+def rate(func):
+    started = time.perf_counter()
+    func()
+    return MESSAGES / (time.perf_counter() - started)
+
+@suite('push')
+def run(stdout):
+    services = [StandInPushService(latency=LATENCY).start() for _ in range(ORIGINS)]
+    subscriptions = make_subscriptions(services, MESSAGES)
+    vapid = Vapid()
+    vapid.generate_keys()
+    private_key = b64(vapid.private_key.private_numbers().private_value.to_bytes(32, 'big'))
+
+    sender = PushSender(vapid_key=vapid, admin_email='bench@example.com', pool_size=WORKERS)
+    payload = '{"title": "bench"}'
+
+    def pooled():
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            list(pool.map(lambda sub: sender.send(sub, payload), subscriptions))
+
+    stdout.write(f'{MESSAGES} messages, {ORIGINS} stand-in origins, {LATENCY * 1000:.0f} ms server latency')
+    stdout.write(f"{'mode':<40} {'msg/s':>8}")
+    stdout.write(f"{'serial webpush(), new connection + JWT':<40} {rate(lambda: legacy_send(subscriptions, private_key)):>8.1f}")
+    stdout.write(f"{'serial PushSender (keep-alive, cached)':<40} {rate(lambda: [sender.send(s, payload) for s in subscriptions]):>8.1f}")
+    stdout.write(f"{f'PushSender, {WORKERS} threads':<40} {rate(pooled):>8.1f}")
+
+    sender.close()
+    for service in services:
+        service.stop()
@@ -0,0 +1,86 @@
+import json
+import statistics
+import time
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from main.synthetic import generate
+from . import scratch_cache, scratch_database, suite
+
+SHOPS = 5
+WORKERS = 20
+MONTHS = 3
+REPEAT = 10
+
+def measure(request):
+    with CaptureQueriesContext(connection) as cold:
+        response = request()
+    durations = []
+    for _ in range(REPEAT):
+        with CaptureQueriesContext(connection) as warm:
+            started = time.perf_counter()
+            response = request()
+            durations.append(time.perf_counter() - started)
+    return {
+        'status': response.status_code,
+        'cold_queries': len(cold.captured_queries),
+        'queries': len(warm.captured_queries),
+        'median_ms': round(statistics.median(durations) * 1000, 2),
+        'min_ms': round(min(durations) * 1000, 2),
+    }
+
+def client_for(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+def update_shift(client, worker, day):
+    values = iter(['09:00', '10:00+'] * (REPEAT + 1))
+
+    def request():
+        return client.post(
+            reverse('main:update_shift'),
+            json.dumps({'worker_id': worker.id, 'coffee_shop_id': worker.coffee_shop_id, 'date': day.isoformat(), 'value': next(values)}),
+            content_type='application/json',
+        )
+    return request
+
+@suite('views')
+def run(stdout):
+    with scratch_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        data = generate(shops=SHOPS, workers=WORKERS, months=MONTHS)
+        shop = data['shops'][0]
+        worker = data['workers'][0]
+        today = timezone.localdate()
+        super_admin = client_for(data['super_admin'])
+        shop_admin = client_for(data['shop_admins'][0])
+        worker_client = client_for(worker.user)
+        schedule_url = reverse('main:schedule', args=[shop.slug, today.year, today.month])
+        cases = {
+            'index (super admin)': lambda: super_admin.get(reverse('main:index')),
+            'index (worker)': lambda: worker_client.get(reverse('main:index')),
+            'get_workers': lambda: shop_admin.get(reverse('main:workers', args=[shop.slug])),
+            'schedule_view (admin)': lambda: shop_admin.get(schedule_url),
+            'schedule_view (worker)': lambda: worker_client.get(schedule_url),
+            'statistics': lambda: super_admin.get(reverse('main:statistics')),
+            'update_shift': update_shift(shop_admin, worker, today),
+        }
+
+        stdout.write(
+            f"{SHOPS} shops x {WORKERS} workers x {MONTHS} months: "
+            f"{data['shifts']} shifts, {data['requests']} requests"
+        )
+        stdout.write(f"{'view':<24} {'status':>6} {'cold q':>7} {'queries':>8} {'median ms':>10} {'min ms':>8}")
+        results = {}
+        for name, request in cases.items():
+            with scratch_cache(f'benchmark {name}'):
+                result = measure(request)
+            results[name] = result
+            stdout.write(
+                f"{name:<24} {result['status']:>6} {result['cold_queries']:>7} {result['queries']:>8} "
+                f"{result['median_ms']:>10.2f} {result['min_ms']:>8.2f}"
+            )
+    return results
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+class ScheduleBroadcaster:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, shop_id, year, month):
+        queue = asyncio.Queue(maxsize=1)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(shop_id, {}).setdefault((year, month), set()).add(entry)
+        return entry
+
+    def unsubscribe(self, shop_id, year, month, entry):
+        with self._lock:
+            months = self._subscribers.get(shop_id, {})
+            subscribers = months.get((year, month), set())
+            subscribers.discard(entry)
+            if not subscribers:
+                months.pop((year, month), None)
+            if not months:
+                self._subscribers.pop(shop_id, None)
+
+    def subscribers_count(self):
+        with self._lock:
+            return sum(len(s) for months in self._subscribers.values() for s in months.values())
+
+    def publish(self, shop_id, year=None, month=None):
+        with self._lock:
+            months = self._subscribers.get(shop_id)
+            if not months:
+                return
+            if year is None:
+                targets = [entry for subscribers in months.values() for entry in subscribers]
+            else:
+                targets = list(months.get((year, month), ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._wake, queue)
+            except RuntimeError:
+                pass
+
+    @staticmethod
+    def _wake(queue):
+        if queue.empty():
+            queue.put_nowait(True)
+
+broadcaster = ScheduleBroadcaster()
+
+def publish_months(cells):
+    for shop_id, year, month in {(shop_id, day.year, day.month) for shop_id, day in cells if shop_id and day}:
+        broadcaster.publish(shop_id, year, month)
+
+def publish_shops(shop_ids):
+    for shop_id in set(shop_ids) - {None}:
+        broadcaster.publish(shop_id)
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or settings.TESTING or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'{backend} хранит данные в памяти одного процесса: сброс прав, графиков и кофеен не дойдёт до других воркеров.',
+        hint='Укажите общий CACHE_BACKEND (Redis, Memcached, файловый или БД) или включите DEBUG.',
+        id='main.E001',
+    )]
@@ -1,10 +1,13 @@
 from django.conf import settings
 
 def user_role_processor(request):
-    from main.views import get_user_role
     context = {}
-    if request.user.is_authenticated:
-        context['user_role'] = get_user_role(request.user)
+    identity = getattr(request, 'identity', None)
+    if identity is not None:
+        context['user_role'] = identity.role
+    elif request.user.is_authenticated:
+        from main.identity import resolve_role
+        context['user_role'] = resolve_role(request.user)
     else:
         context['user_role'] = None
     
@@ -0,0 +1,19 @@
+from django.db.models import Count
+from .models import ShiftRequest
+
+def _counts_by_shop(qs, shop_ids=None):
+    if shop_ids is not None:
+        qs = qs.filter(shift__coffee_shop_id__in=list(shop_ids))
+    rows = qs.values('shift__coffee_shop_id').annotate(n=Count('id')).order_by()
+    return {r['shift__coffee_shop_id']: r['n'] for r in rows}
+
+def pending_counts(shop_ids=None):
+    return _counts_by_shop(ShiftRequest.objects.filter(status='PENDING'), shop_ids)
+
+def awaiting_taker_counts(worker, shop_ids=None):
+    return _counts_by_shop(ShiftRequest.objects.filter(taken_by=worker, status='AWAITING_TAKER'), shop_ids)
+
+def annotate_pending(cafes, counts):
+    for c in cafes:
+        c.pending_applications_count = counts.get(c.id, 0)
+    return cafes
@@ -0,0 +1,56 @@
+from collections import Counter
+from datetime import timedelta
+from django.db.models import Count, Q
+from django.db.models.functions import Coalesce
+from .models import Shift
+
+def covers_shop(shift, shop_id):
+    if shift is None or shift.display_text:
+        return False
+    return (shift.another_shop_id or shift.coffee_shop_id) == shop_id
+
+def count_coverage(shifts, shop_id):
+    counts = Counter()
+    for shift in shifts:
+        if covers_shop(shift, shop_id):
+            counts[shift.date] += 1
+    return counts
+
+def coverage_counts(date_from, date_to, shops=None):
+    qs = Shift.objects.filter(date__gte=date_from, date__lte=date_to, display_text='')
+    if shops is not None:
+        shop_ids = [getattr(s, 'id', s) for s in shops]
+        qs = qs.filter(Q(coffee_shop_id__in=shop_ids) | Q(another_shop_id__in=shop_ids))
+    rows = (
+        qs.annotate(effective_shop_id=Coalesce('another_shop_id', 'coffee_shop_id'))
+        .values('effective_shop_id', 'date')
+        .annotate(workers_count=Count('id'))
+        .order_by()
+    )
+    return {(r['effective_shop_id'], r['date']): r['workers_count'] for r in rows}
+
+def build_days_info(days, counts, minimum_workers):
+    days_info = []
+    for day in days:
+        workers_count = counts.get(day, 0)
+        days_info.append({
+            'date': day,
+            'workers_count': workers_count,
+            'minimum_workers': minimum_workers,
+            'shortage': max(0, minimum_workers - workers_count),
+            'is_understaffed': workers_count < minimum_workers,
+        })
+    return days_info
+
+def shop_coverage(shop, days, counts):
+    return build_days_info(days, {d: counts.get((shop.id, d), 0) for d in days}, shop.minimum_workers)
+
+def understaffed_days(date_from, date_to, shops):
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    counts = coverage_counts(date_from, date_to)
+    return [
+        (shop, day)
+        for shop in shops
+        for day in shop_coverage(shop, days, counts)
+        if day['is_understaffed']
+    ]
@@ -0,0 +1,75 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import batching
+from .coverage import coverage_counts
+from .models import StaffingAlert
+from .shop_registry import shops as shop_registry
+
+def cells_changed(cells):
+    batching.on_commit(reconcile, cells)
+
+def reconcile(cells):
+    today = timezone.localdate()
+    horizon_end = today + timedelta(days=settings.STAFFING_HORIZON_DAYS - 1)
+    cells = {(shop_id, day) for shop_id, day in cells if shop_id and day and today <= day <= horizon_end}
+    if not cells:
+        return
+
+    shop_ids = {shop_id for shop_id, _ in cells}
+    days = {day for _, day in cells}
+    counts = coverage_counts(min(days), max(days), shop_ids)
+    shops_by_id = {s.id: s for s in shop_registry.filter_ids(shop_ids)}
+    alerted = {
+        (shop_id, day): count for shop_id, day, count in
+        StaffingAlert.objects.filter(coffee_shop_id__in=shop_ids, date__in=days)
+        .values_list('coffee_shop_id', 'date', 'workers_count')
+    }
+
+    below, restored = [], Q()
+    for shop_id, day in cells:
+        shop = shops_by_id.get(shop_id)
+        if shop is None:
+            continue
+        workers_count = counts.get((shop_id, day), 0)
+        if workers_count >= shop.minimum_workers:
+            if (shop_id, day) in alerted:
+                restored |= Q(coffee_shop_id=shop_id, date=day)
+        elif workers_count < alerted.get((shop_id, day), shop.minimum_workers):
+            below.append(StaffingAlert(coffee_shop_id=shop_id, date=day, workers_count=workers_count, pending=True))
+
+    if restored:
+        StaffingAlert.objects.filter(restored).delete()
+    if below:
+        StaffingAlert.objects.bulk_create(
+            below,
+            update_conflicts=True,
+            unique_fields=['coffee_shop', 'date'],
+            update_fields=['workers_count', 'pending', 'updated_at'],
+        )
+
+def flush_pending(now=None):
+    from .utils import notify_understaffed
+
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.STAFFING_ALERT_DEBOUNCE)
+    with transaction.atomic():
+        pending = list(StaffingAlert.objects.select_for_update().filter(pending=True).order_by('coffee_shop_id', 'date'))
+        busy = {a.coffee_shop_id for a in pending if a.updated_at > cutoff}
+        ready = [a for a in pending if a.coffee_shop_id not in busy and a.date >= timezone.localdate()]
+        StaffingAlert.objects.filter(id__in=[a.id for a in ready]).update(pending=False)
+
+    by_shop = {}
+    for alert in ready:
+        by_shop.setdefault(alert.coffee_shop_id, []).append(alert)
+    shops_by_id = {s.id: s for s in shop_registry.filter_ids(by_shop)}
+    for shop_id, alerts in by_shop.items():
+        shop = shops_by_id.get(shop_id)
+        if shop is None:
+            continue
+        notify_understaffed(shop, [
+            {'date': a.date, 'workers_count': a.workers_count, 'minimum_workers': shop.minimum_workers}
+            for a in alerts
+        ])
+    return len(ready)
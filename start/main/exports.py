@@ -0,0 +1,174 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from .models import PayrollEntry
+from .payroll import PayrollReport
+from .schedule import build_month_schedule
+from .schedule_sync import shift_text
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+SCHEDULE_HEADER = ['Кофейня', 'Работник', 'Дата', 'Смена', 'Заявка на обмен']
+PAYROLL_HEADER = ['Кофейня', 'Работник', 'Ставка', 'Смен', 'Из них с плюсом', 'Разбивка', 'Итого']
+PAYROLL_ENTRIES_HEADER = ['Кофейня', 'Работник', 'Дата', 'Ставка', 'Надбавка за стаж', 'Плюс', 'Сумма']
+
+def iter_months(date_from, date_to):
+    year, month = date_from.year, date_from.month
+    while (year, month) <= (date_to.year, date_to.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+def schedule_rows(shops, date_from, date_to):
+    yield SCHEDULE_HEADER
+    for shop in shops:
+        for year, month in iter_months(date_from, date_to):
+            for row in build_month_schedule(shop, year, month)['schedule_rows']:
+                for cell in row['cells']:
+                    if not date_from <= cell['date'] <= date_to:
+                        continue
+                    if cell['shift'] is None and not cell['has_request']:
+                        continue
+                    yield [
+                        shop.name,
+                        row['worker'].name,
+                        cell['date'].isoformat(),
+                        shift_text(cell['shift']),
+                        'да' if cell['has_request'] else '',
+                    ]
+
+def payroll_rows(date_from, date_to, shop_ids=None):
+    yield PAYROLL_HEADER
+    for shop, row in PayrollReport.build(date_from, date_to, shop_ids).rows():
+        yield [
+            shop.name,
+            row['worker'].name,
+            row['rate'],
+            row['shifts_count'],
+            row['plus_shifts_count'],
+            row['breakdown'],
+            row['total_salary'],
+        ]
+
+def payroll_entry_rows(date_from, date_to, shop_ids=None):
+    yield PAYROLL_ENTRIES_HEADER
+    entries = PayrollEntry.objects.filter(date__gte=date_from, date__lte=date_to)
+    if shop_ids is not None:
+        entries = entries.filter(worker__coffee_shop_id__in=list(shop_ids))
+    entries = entries.order_by('shop__name', 'worker__name', 'date').values_list(
+        'shop__name', 'worker__name', 'date', 'base_rate', 'experience_bonus', 'plus_bonus', 'amount',
+    )
+    for shop_name, worker_name, day, base_rate, bonus, plus_bonus, amount in entries.iterator(chunk_size=CHUNK_SIZE):
+        yield [shop_name, worker_name, day.isoformat(), base_rate, bonus, plus_bonus, amount]
+
+class _Buffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class _TextBuffer:
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def write(self, text):
+        return self.buffer.write(text.encode('utf-8'))
+
+def stream_csv(rows):
+    buffer = _Buffer()
+    writer = csv.writer(_TextBuffer(buffer))
+    yield '\ufeff'.encode('utf-8')
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.drain()
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _column(index):
+    name = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        name = chr(65 + rest) + name
+    return name
+
+def _xlsx_row(number, values):
+    cells = []
+    for index, value in enumerate(values):
+        ref = f'{_column(index)}{number}'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = escape(_ILLEGAL_XML.sub('', str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'.encode('utf-8')
+
+def stream_xlsx(rows, sheet_name='Лист1'):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(name=escape(sheet_name[:31], {'"': '&quot;'})))
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for number, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(number, row))
+                if buffer.chunks:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+def stream(rows, fmt, sheet_name='Лист1'):
+    if fmt == 'xlsx':
+        return stream_xlsx(rows, sheet_name)
+    return stream_csv(rows)
@@ -81,7 +81,8 @@ class WorkerSelfRegistrationForm(forms.Form):
         send_push_to_admin(
             title="Новая регистрация!",
             body=f"Зарегестрировался {worker.name}. Требуется подтверждение.",
-            url=f"{settings.SITE_URL}/managment/pending/"
+            url=f"{settings.SITE_URL}/managment/pending/",
+            topic="registrations",
         )
 
         if commit:
@@ -0,0 +1,83 @@
+import uuid
+from django.core import signing
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from .models import UserProfile, ShopAdmin, Worker
+
+SESSION_KEY = '_main_identity'
+SIGNING_SALT = 'main.identity'
+
+def _version_key(user_id):
+    return f'identity:version:{user_id}'
+
+def identity_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+def invalidate_identity(user_ids):
+    for user_id in set(user_ids) - {None}:
+        cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+def resolve_role(user):
+    if not user.is_authenticated:
+        return None
+    if user.is_superuser:
+        return 'SUPER_ADMIN'
+
+    try:
+        return user.profile.role
+    except UserProfile.DoesNotExist:
+        UserProfile.objects.create(user=user, role='WORKER')
+        return 'WORKER'
+
+class Identity:
+    def __init__(self, request):
+        self._request = request
+        self.user = request.user
+
+    @cached_property
+    def _data(self):
+        if not self.user.is_authenticated:
+            return {'role': None, 'worker_id': None, 'worker_shop_id': None, 'admin_shop_ids': []}
+
+        session = getattr(self._request, 'session', None)
+        version = identity_version(self.user.id)
+        if session is not None and session.get(SESSION_KEY):
+            try:
+                data = signing.loads(session[SESSION_KEY], salt=SIGNING_SALT)
+                if data['user_id'] == self.user.id and data['version'] == version:
+                    return data
+            except (signing.BadSignature, KeyError, TypeError):
+                pass
+
+        worker = Worker.objects.filter(user=self.user).values('id', 'coffee_shop_id').first() or {}
+        data = {
+            'user_id': self.user.id,
+            'version': version,
+            'role': resolve_role(self.user),
+            'worker_id': worker.get('id'),
+            'worker_shop_id': worker.get('coffee_shop_id'),
+            'admin_shop_ids': list(ShopAdmin.objects.filter(user=self.user).values_list('coffee_shop_id', flat=True)),
+        }
+        if session is not None:
+            session[SESSION_KEY] = signing.dumps(data, salt=SIGNING_SALT)
+        return data
+
+    @property
+    def role(self):
+        return self._data['role']
+
+    @property
+    def worker_id(self):
+        return self._data['worker_id']
+
+    @property
+    def worker_shop_id(self):
+        return self._data['worker_shop_id']
+
+    @cached_property
+    def admin_shop_ids(self):
+        return frozenset(self._data['admin_shop_ids'])
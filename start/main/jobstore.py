@@ -0,0 +1,82 @@
+import pickle
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import SchedulerJob
+
+class DjangoJobStore(BaseJobStore):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def lookup_job(self, job_id):
+        state = SchedulerJob.objects.filter(id=job_id).values_list('job_state', flat=True).first()
+        return self._reconstitute_job(state) if state is not None else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs(next_run_time__lte=datetime_to_utc_timestamp(now))
+
+    def get_next_run_time(self):
+        timestamp = (
+            SchedulerJob.objects.filter(next_run_time__isnull=False)
+            .order_by('next_run_time').values_list('next_run_time', flat=True).first()
+        )
+        return utc_timestamp_to_datetime(timestamp)
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            with transaction.atomic():
+                SchedulerJob.objects.create(
+                    id=job.id,
+                    next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+                    job_state=self._dump(job),
+                )
+        except IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        updated = SchedulerJob.objects.filter(id=job.id).update(
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=self._dump(job),
+        )
+        if not updated:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        deleted, _ = SchedulerJob.objects.filter(id=job_id).delete()
+        if not deleted:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        SchedulerJob.objects.all().delete()
+
+    def _dump(self, job):
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(bytes(job_state))
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, **filters):
+        jobs = []
+        failed_job_ids = []
+        rows = SchedulerJob.objects.filter(**filters).order_by(F('next_run_time').asc(nulls_last=True))
+        for job_id, job_state in rows.values_list('id', 'job_state'):
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed_job_ids.append(job_id)
+        if failed_job_ids:
+            SchedulerJob.objects.filter(id__in=failed_job_ids).delete()
+        return jobs
@@ -0,0 +1,106 @@
+from django.db import transaction
+from django.db.models import F, Q
+from .models import PayrollEntry, Shift, Worker
+from . import batching
+from .payroll import PLUS_BONUS, experience_bonus
+from .rates import RateTimeline
+
+BATCH_SIZE = 2000
+UPDATE_FIELDS = ['shop', 'is_plus', 'base_rate', 'experience_bonus', 'plus_bonus', 'amount']
+
+def is_payable(shift):
+    return not (shift.display_text or '').strip()
+
+def make_entry(shift, worker, timeline):
+    shop_id = shift.another_shop_id or shift.coffee_shop_id
+    base_rate = timeline.rate_for(shop_id, shift.date)
+    bonus = experience_bonus(worker, shift.date)
+    plus_bonus = PLUS_BONUS if shift.is_plus else 0
+    return PayrollEntry(
+        worker_id=shift.worker_id,
+        date=shift.date,
+        shop_id=shop_id,
+        is_plus=shift.is_plus,
+        base_rate=base_rate,
+        experience_bonus=bonus,
+        plus_bonus=plus_bonus,
+        amount=base_rate + bonus + plus_bonus,
+    )
+
+def _upsert(entries):
+    if entries:
+        PayrollEntry.objects.bulk_create(
+            entries,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['worker', 'date'],
+            update_fields=UPDATE_FIELDS,
+        )
+
+def sync_cells(cells):
+    cells = {(worker_id, day) for worker_id, day in cells if worker_id and day}
+    if not cells:
+        return
+    worker_ids = {worker_id for worker_id, _ in cells}
+    dates = {day for _, day in cells}
+
+    shifts = [
+        s for s in Shift.objects.filter(worker_id__in=worker_ids, date__in=dates)
+        if (s.worker_id, s.date) in cells and is_payable(s)
+    ]
+    workers = Worker.objects.only('id', 'start_date_experience_years').in_bulk({s.worker_id for s in shifts})
+    timeline = RateTimeline.load({s.another_shop_id or s.coffee_shop_id for s in shifts})
+
+    entries = [make_entry(s, workers[s.worker_id], timeline) for s in shifts]
+    stale = cells - {(e.worker_id, e.date) for e in entries}
+    with transaction.atomic():
+        if stale:
+            stale_q = Q()
+            for worker_id, day in stale:
+                stale_q |= Q(worker_id=worker_id, date=day)
+            PayrollEntry.objects.filter(stale_q).delete()
+        _upsert(entries)
+
+def cells_changed(cells):
+    batching.on_commit(sync_cells, cells)
+
+def rebuild(date_from=None, date_to=None, worker_ids=None):
+    shifts = Shift.objects.all()
+    entries = PayrollEntry.objects.all()
+    if date_from:
+        shifts, entries = shifts.filter(date__gte=date_from), entries.filter(date__gte=date_from)
+    if date_to:
+        shifts, entries = shifts.filter(date__lte=date_to), entries.filter(date__lte=date_to)
+    if worker_ids is not None:
+        shifts, entries = shifts.filter(worker_id__in=worker_ids), entries.filter(worker_id__in=worker_ids)
+
+    workers = Worker.objects.only('id', 'start_date_experience_years').in_bulk(worker_ids)
+    timeline = RateTimeline.load()
+
+    created = 0
+    with transaction.atomic():
+        entries.delete()
+        batch = []
+        for shift in shifts.order_by('date', 'worker_id').iterator(chunk_size=BATCH_SIZE):
+            if not is_payable(shift):
+                continue
+            batch.append(make_entry(shift, workers[shift.worker_id], timeline))
+            if len(batch) >= BATCH_SIZE:
+                PayrollEntry.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        PayrollEntry.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+def reprice_shop(shop_id):
+    for start, end, rate in RateTimeline.load([shop_id]).intervals(shop_id):
+        entries = PayrollEntry.objects.filter(shop_id=shop_id)
+        if start:
+            entries = entries.filter(date__gte=start)
+        if end:
+            entries = entries.filter(date__lt=end)
+        entries.exclude(base_rate=rate).update(
+            base_rate=rate,
+            amount=rate + F('experience_bonus') + F('plus_bonus'),
+        )
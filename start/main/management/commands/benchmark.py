@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main.benchmarks import load_suites
+
+REGRESSION_RATIO = 1.25
+
+class Command(BaseCommand):
+    help = 'Запускает микро-бенчмарки. Без аргументов выводит список доступных наборов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*')
+        parser.add_argument('--save', metavar='PATH', help='Сохранить результаты в JSON как базовую линию')
+        parser.add_argument('--compare', metavar='PATH', help='Сравнить результаты с сохранённой базовой линией')
+
+    def handle(self, *args, **options):
+        suites = load_suites()
+        if not options['suites']:
+            self.stdout.write('Доступные наборы: ' + ', '.join(sorted(suites)))
+            return
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())['suites']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Не удалось прочитать базовую линию: {e}')
+
+        results = {}
+        for name in options['suites']:
+            if name not in suites:
+                raise CommandError(f'Неизвестный набор: {name}')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {name} =='))
+            result = suites[name](self.stdout)
+            if result:
+                results[name] = result
+                if baseline and name in baseline:
+                    self.compare(result, baseline[name])
+
+        if options['save']:
+            Path(options['save']).write_text(json.dumps(
+                {'created_at': timezone.now().isoformat(), 'suites': results}, ensure_ascii=False, indent=2,
+            ))
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['save']}"))
+
+    def compare(self, current, baseline):
+        self.stdout.write(f"{'case':<24} {'queries':>12} {'median ms':>24}")
+        for case, result in current.items():
+            old = baseline.get(case)
+            if old is None:
+                self.stdout.write(f'{case:<24} (нет в базовой линии)')
+                continue
+            queries = f"{old['queries']} -> {result['queries']}"
+            change = result['median_ms'] / old['median_ms'] - 1 if old['median_ms'] else 0
+            timing = f"{old['median_ms']:.2f} -> {result['median_ms']:.2f} ({change:+.0%})"
+            line = f'{case:<24} {queries:>12} {timing:>24}'
+            regressed = result['queries'] > old['queries'] or result['median_ms'] > old['median_ms'] * REGRESSION_RATIO
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
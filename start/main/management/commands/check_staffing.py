@@ -1,10 +1,24 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from main.utils import check_and_notify_understaffing
 
 class Command(BaseCommand):
-    help = 'Проверяет график на нехватку персонала за 2 дня до даты и отправляет пуш-уведомления админам.'
+    help = 'Проверяет график на нехватку персонала на ближайшие дни и отправляет пуш-уведомления админам о новых нехватках.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=settings.STAFFING_HORIZON_DAYS, help='Сколько дней вперед проверять, начиная с сегодняшнего')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать нехватки, ничего не отправлять')
 
     def handle(self, *args, **options):
+        if options['horizon'] < 1:
+            raise CommandError('Горизонт должен быть не меньше одного дня')
         self.stdout.write('Запуск проверки персонала...')
-        check_and_notify_understaffing()
-        self.stdout.write(self.style.SUCCESS('Проверка завершена успешно.'))
+        gaps, fresh = check_and_notify_understaffing(options['horizon'], options['dry_run'])
+        fresh = {(shop.id, day['date']) for shop, day in fresh}
+        for shop, day in gaps:
+            mark = ' (новая)' if (shop.id, day['date']) in fresh else ''
+            self.stdout.write(f"{shop.name}, {day['date'].strftime('%d.%m')}: {day['workers_count']} из {day['minimum_workers']}{mark}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Пробный запуск: уведомления не отправлялись, новых нехваток: {len(fresh)}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Проверка завершена успешно. Новых нехваток: {len(fresh)}.'))
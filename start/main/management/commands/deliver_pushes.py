@@ -0,0 +1,23 @@
+import signal
+from django.core.management.base import BaseCommand
+from main.models import PushMessage
+from main.push import PushDeliveryService
+
+class Command(BaseCommand):
+    help = 'Отправляет пуш-уведомления из очереди. Одновременно работает только один экземпляр.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Количество потоков отправки')
+        parser.add_argument('--once', action='store_true', help='Отправить то, что уже готово, и выйти')
+
+    def handle(self, *args, **options):
+        service = PushDeliveryService(workers=options['workers'])
+        signal.signal(signal.SIGTERM, lambda *_: service.stop())
+        self.stdout.write(f'Отправка уведомлений ({service.workers} потоков)...')
+        try:
+            service.run(once=options['once'])
+        except KeyboardInterrupt:
+            service.stop()
+        pending = PushMessage.objects.filter(status='PENDING').count()
+        failed = PushMessage.objects.filter(status='FAILED').count()
+        self.stdout.write(self.style.SUCCESS(f'Остановлено. В очереди: {pending}, не доставлено: {failed}.'))
@@ -0,0 +1,45 @@
+import sys
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from main import exports
+from main.shop_registry import shops
+
+class Command(BaseCommand):
+    help = 'Выгружает график или зарплату за период в CSV или XLSX.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['schedule', 'payroll', 'payroll-entries'], help='Что выгружать')
+        parser.add_argument('--from', dest='date_from', required=True, help='Начало периода, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', required=True, help='Конец периода, ГГГГ-ММ-ДД')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv', help='Формат файла')
+        parser.add_argument('--shop', action='append', dest='shops', help='Slug кофейни (можно указать несколько раз)')
+        parser.add_argument('--output', help='Файл для записи (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.strptime(options['date_from'], '%Y-%m-%d').date()
+            date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Дата должна быть в формате ГГГГ-ММ-ДД')
+
+        selected = shops.all()
+        if options['shops']:
+            selected = [shops.get_by_slug(slug) for slug in options['shops']]
+            if None in selected:
+                raise CommandError('Кофейня не найдена')
+        shop_ids = [s.id for s in selected]
+
+        if options['kind'] == 'schedule':
+            rows = exports.schedule_rows(selected, date_from, date_to)
+        elif options['kind'] == 'payroll':
+            rows = exports.payroll_rows(date_from, date_to, shop_ids)
+        else:
+            rows = exports.payroll_entry_rows(date_from, date_to, shop_ids)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in exports.stream(rows, options['format']):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
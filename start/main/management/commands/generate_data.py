@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.models import CoffeeShop
+from main.synthetic import PASSWORD, generate
+
+class Command(BaseCommand):
+    help = 'Создаёт синтетические кофейни, работников, смены и заявки для нагрузочного тестирования.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=3, help='Количество кофеен')
+        parser.add_argument('--workers', type=int, default=15, help='Работников в каждой кофейне')
+        parser.add_argument('--months', type=int, default=3, help='Сколько месяцев графика, считая текущий')
+        parser.add_argument('--prefix', default='syn', help='Префикс имён кофеен и логинов')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if CoffeeShop.objects.filter(slug__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Данные с префиксом «{prefix}» уже есть, укажите другой --prefix')
+        result = generate(
+            shops=options['shops'],
+            workers=options['workers'],
+            months=options['months'],
+            prefix=prefix,
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: кофеен {len(result['shops'])}, работников {len(result['workers'])}, "
+            f"смен {result['shifts']}, заявок {result['requests']}, записей ведомости {result['payroll_entries']} "
+            f"({result['date_from']:%d.%m.%Y} – {result['date_to']:%d.%m.%Y})."
+        ))
+        self.stdout.write(f'Логины: {prefix}_admin, {prefix}_shop1…, {prefix}_w1_1…; пароль: {PASSWORD}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from main.push import prune
+
+class Command(BaseCommand):
+    help = 'Удаляет пуш-подписки, которые давно не принимают уведомления, и старые недоставленные сообщения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не удалять')
+
+    def handle(self, *args, **options):
+        subscriptions, failed = prune(dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'Будет удалено подписок: {subscriptions}, недоставленных сообщений: {failed}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Удалено подписок: {subscriptions}, недоставленных сообщений: {failed}'))
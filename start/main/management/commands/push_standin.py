@@ -0,0 +1,69 @@
+import signal
+import threading
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from main.models import PushSubscriptions
+from main.push_standin import StandInPushService
+
+class Command(BaseCommand):
+    help = 'Запускает локальный сервис пуш-уведомлений для нагрузочных тестов: принимает и расшифровывает сообщения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0, help='Задержка ответа, мс')
+        parser.add_argument('--gone', type=float, default=0, help='Доля ответов 410')
+        parser.add_argument('--throttle', type=float, default=0, help='Доля ответов 429')
+        parser.add_argument('--error', type=float, default=0, help='Доля ответов 503')
+        parser.add_argument('--subscribe', type=int, default=0, help='Сколько подписок создать каждому пользователю')
+        parser.add_argument('--users', nargs='*', help='Логины пользователей (по умолчанию все администраторы)')
+
+    def handle(self, *args, **options):
+        service = StandInPushService(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'] / 1000,
+            gone_rate=options['gone'],
+            throttle_rate=options['throttle'],
+            error_rate=options['error'],
+        )
+        created = self.subscribe(service, options['subscribe'], options['users'])
+        service.start()
+        self.stdout.write(f'Сервис слушает {service.url}, создано подписок: {len(created)}. Ctrl+C для остановки.')
+
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+        try:
+            while not stopped.wait(10):
+                self.report(service)
+        except KeyboardInterrupt:
+            pass
+        service.stop()
+        PushSubscriptions.objects.filter(id__in=created).delete()
+        self.report(service)
+
+    def subscribe(self, service, count, usernames):
+        if not count:
+            return []
+        if usernames:
+            users = list(User.objects.filter(username__in=usernames))
+            missing = set(usernames) - {u.username for u in users}
+            if missing:
+                raise CommandError(f'Нет пользователей: {", ".join(sorted(missing))}')
+        else:
+            users = list(User.objects.filter(
+                Q(is_superuser=True) | Q(profile__role__in=['SUPER_ADMIN', 'SHOP_ADMIN'])
+            ).distinct())
+        subscriptions = []
+        for user in users:
+            for _ in range(count):
+                info = service.subscribe()
+                subscriptions.append(PushSubscriptions(
+                    user=user, endpoint=info['endpoint'], auth=info['keys']['auth'], p256dh=info['keys']['p256dh'],
+                ))
+        return [s.id for s in PushSubscriptions.objects.bulk_create(subscriptions)]
+
+    def report(self, service):
+        stats = ', '.join(f'{status}: {count}' for status, count in sorted(service.stats.items())) or 'нет запросов'
+        self.stdout.write(stats)
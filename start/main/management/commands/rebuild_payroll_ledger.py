@@ -0,0 +1,22 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from main import ledger
+
+class Command(BaseCommand):
+    help = 'Пересчитывает журнал начислений по сменам за период (по умолчанию за всё время).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Начало периода, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', help='Конец периода, ГГГГ-ММ-ДД')
+        parser.add_argument('--worker', type=int, action='append', dest='worker_ids', help='ID работника (можно указать несколько раз)')
+
+    def handle(self, *args, **options):
+        try:
+            date_from, date_to = (
+                datetime.strptime(options[key], '%Y-%m-%d').date() if options[key] else None
+                for key in ('date_from', 'date_to')
+            )
+        except ValueError:
+            raise CommandError('Дата должна быть в формате ГГГГ-ММ-ДД')
+        created = ledger.rebuild(date_from, date_to, options['worker_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Записей в журнале: {created}'))
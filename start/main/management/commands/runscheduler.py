@@ -0,0 +1,35 @@
+import signal
+from django.core.management.base import BaseCommand
+from main.models import SchedulerJob
+from main import push
+from main.scheduler import SchedulerService
+
+class Command(BaseCommand):
+    help = 'Запускает планировщик задач и отправку пуш-уведомлений. Одновременно работает только один экземпляр, остальные ждут в резерве.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='store_true', help='Показать статистику задач и выйти')
+        parser.add_argument('--without-push', action='store_true', help='Не отправлять пуш-уведомления (если работает deliver_pushes)')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            for job in SchedulerJob.objects.order_by('id'):
+                average = job.total_duration / job.run_count if job.run_count else 0
+                self.stdout.write(
+                    f"{job.id}: запусков {job.run_count}, ошибок {job.failure_count}, "
+                    f"последний {job.last_started_at or '—'} ({job.last_status or '—'}, {job.last_duration or 0:.2f} с), "
+                    f"в среднем {average:.2f} с"
+                )
+            return
+
+        service = SchedulerService()
+        delivery = None if options['without_push'] else push.start()
+        signal.signal(signal.SIGTERM, lambda *_: service.stop())
+        self.stdout.write(f'Планировщик {service.owner} запущен, ожидание блокировки...')
+        try:
+            service.run()
+        except KeyboardInterrupt:
+            service.stop()
+        if delivery is not None:
+            delivery.stop()
+        self.stdout.write(self.style.SUCCESS('Планировщик остановлен.'))
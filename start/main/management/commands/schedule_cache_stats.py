@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from main import schedule_cache
+
+class Command(BaseCommand):
+    help = 'Показывает статистику попаданий в кэш графиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = schedule_cache.get_stats()
+        self.stdout.write(f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, доля попаданий: {stats['hit_ratio']:.1%}")
+        if options['reset']:
+            schedule_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики обнулены.'))
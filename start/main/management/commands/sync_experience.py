@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from main.models import Worker
+
+class Command(BaseCommand):
+    help = 'Пересчитывает и сохраняет стаж всех работников (ночная задача).'
+
+    def handle(self, *args, **options):
+        updated = Worker.persist_experience_years()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено работников: {updated}'))
@@ -1,28 +1,49 @@
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
+from .identity import Identity
+
+class IdentityMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.identity = Identity(request)
+        return self.get_response(request)
+
+def _url_prefix(url):
+    return '/' + url.lstrip('/') if url else None
 
 class LoginRequiredMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.asset_prefixes = tuple(p for p in (_url_prefix(settings.STATIC_URL), _url_prefix(settings.MEDIA_URL)) if p)
+        self.public_prefixes = ('/admin/',)
+        self._public_paths = None
+        self._unassigned_paths = None
+
+    def _load_paths(self):
+        self._public_paths = frozenset((reverse('main:login'), reverse('main:register')))
+        self._unassigned_paths = self._public_paths | {reverse('main:index'), reverse('main:logout')}
 
     def __call__(self, request):
-        allowed_urls = [
-            reverse('main:login'),
-            reverse('main:register'),
-            '/admin/',
-        ]
-
-        if not request.user.is_authenticated:
-            if request.path not in allowed_urls and not (request.path.startswith('/static/') or request.path.startswith('/media/')):
-                return redirect('main:login')
+        path = request.path
+        if path.startswith(self.asset_prefixes):
             return self.get_response(request)
 
-        if request.user.is_authenticated and not request.user.is_superuser:
-            from .models import Worker
-            worker = Worker.objects.filter(user=request.user).first()
-            
-            if worker and not worker.coffee_shop and request.path != reverse('main:index') and request.path not in allowed_urls:
-                if not (request.path.startswith('/static/') or request.path.startswith('/media/') or request.path == reverse('main:logout')):
-                    return redirect('main:index')
+        if self._public_paths is None:
+            self._load_paths()
+
+        if path in self._public_paths or path.startswith(self.public_prefixes):
+            return self.get_response(request)
+
+        user = request.user
+        if not user.is_authenticated:
+            return redirect('main:login')
+
+        if not user.is_superuser and path not in self._unassigned_paths:
+            identity = request.identity
+            if identity.worker_id and not identity.worker_shop_id:
+                return redirect('main:index')
 
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_helpitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shop_id', models.BigIntegerField()),
+                ('worker_id', models.BigIntegerField(blank=True, null=True)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'schedule_changes',
+                'indexes': [models.Index(fields=['shop_id', 'id'], name='schedule_ch_shop_id_595bb1_idx')],
+            },
+        ),
+    ]
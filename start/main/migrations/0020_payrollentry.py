@@ -0,0 +1,61 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_payroll_entries(apps, schema_editor):
+    Shift = apps.get_model('main', 'Shift')
+    Worker = apps.get_model('main', 'Worker')
+    CoffeeShop = apps.get_model('main', 'CoffeeShop')
+    PayrollEntry = apps.get_model('main', 'PayrollEntry')
+
+    starts = dict(Worker.objects.values_list('id', 'start_date_experience_years'))
+    rates = dict(CoffeeShop.objects.values_list('id', 'hourly_rate'))
+    batch = []
+    for shift in Shift.objects.order_by('id').iterator(chunk_size=2000):
+        if (shift.display_text or '').strip():
+            continue
+        shop_id = shift.another_shop_id or shift.coffee_shop_id
+        start = starts.get(shift.worker_id)
+        bonus = max(0, (shift.date - start).days // 180) * 100 if start else 0
+        plus_bonus = 500 if shift.is_plus else 0
+        batch.append(PayrollEntry(
+            worker_id=shift.worker_id, date=shift.date, shop_id=shop_id, is_plus=shift.is_plus,
+            base_rate=rates[shop_id], experience_bonus=bonus, plus_bonus=plus_bonus,
+            amount=rates[shop_id] + bonus + plus_bonus,
+        ))
+        if len(batch) >= 2000:
+            PayrollEntry.objects.bulk_create(batch)
+            batch = []
+    PayrollEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_schedulechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('is_plus', models.BooleanField(default=False)),
+                ('base_rate', models.IntegerField()),
+                ('experience_bonus', models.IntegerField(default=0)),
+                ('plus_bonus', models.IntegerField(default=0)),
+                ('amount', models.IntegerField()),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_entries', to='main.coffeeshop')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_entries', to='main.worker')),
+            ],
+            options={
+                'db_table': 'payroll_entries',
+                'indexes': [models.Index(fields=['date', 'worker'], name='payroll_ent_date_bb7f45_idx'), models.Index(fields=['shop', 'date'], name='payroll_ent_shop_id_739895_idx')],
+                'unique_together': {('worker', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_payroll_entries, migrations.RunPython.noop),
+    ]
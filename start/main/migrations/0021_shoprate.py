@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from datetime import date
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def seed_rates(apps, schema_editor):
+    CoffeeShop = apps.get_model('main', 'CoffeeShop')
+    Shift = apps.get_model('main', 'Shift')
+    ShopRate = apps.get_model('main', 'ShopRate')
+
+    first_day = Shift.objects.aggregate(first=Min('date'))['first'] or date.today()
+    ShopRate.objects.bulk_create(
+        ShopRate(coffee_shop_id=shop_id, hourly_rate=rate, effective_from=first_day)
+        for shop_id, rate in CoffeeShop.objects.values_list('id', 'hourly_rate')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_payrollentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hourly_rate', models.IntegerField()),
+                ('effective_from', models.DateField()),
+                ('coffee_shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='main.coffeeshop')),
+            ],
+            options={
+                'db_table': 'shop_rates',
+                'ordering': ['coffee_shop', 'effective_from'],
+                'unique_together': {('coffee_shop', 'effective_from')},
+            },
+        ),
+        migrations.RunPython(seed_rates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_shoprate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffingAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('workers_count', models.IntegerField()),
+                ('notified_at', models.DateTimeField(auto_now=True)),
+                ('coffee_shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staffing_alerts', to='main.coffeeshop')),
+            ],
+            options={
+                'db_table': 'staffing_alerts',
+                'indexes': [models.Index(fields=['date'], name='staffing_al_date_2c6fa1_idx')],
+                'unique_together': {('coffee_shop', 'date')},
+            },
+        ),
+    ]
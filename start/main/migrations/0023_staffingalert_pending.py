@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_staffingalert'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='staffingalert',
+            old_name='notified_at',
+            new_name='updated_at',
+        ),
+        migrations.AddField(
+            model_name='staffingalert',
+            name='pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='staffingalert',
+            index=models.Index(fields=['pending', 'updated_at'], name='staffing_al_pending_cdef57_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_scheduler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.TextField()),
+                ('status', models.CharField(choices=[('PENDING', 'Ожидает отправки'), ('FAILED', 'Не доставлено')], default='PENDING', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='main.pushsubscriptions')),
+            ],
+            options={
+                'db_table': 'push_outbox',
+                'indexes': [models.Index(fields=['status', 'id'], name='push_outbox_status_146f96_idx'), models.Index(fields=['subscription', 'id'], name='push_outbox_subscri_b04c01_idx')],
+            },
+        ),
+    ]
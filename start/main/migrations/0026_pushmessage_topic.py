@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_pushmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushmessage',
+            name='items',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='pushmessage',
+            name='topic',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='pushmessage',
+            index=models.Index(fields=['subscription', 'topic', 'status'], name='push_outbox_subscri_9a6016_idx'),
+        ),
+    ]
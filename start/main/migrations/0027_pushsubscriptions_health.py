@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_pushmessage_topic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushsubscriptions',
+            name='failure_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pushsubscriptions',
+            name='last_failure_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscriptions',
+            name='last_success_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscriptions',
+            name='retry_after',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def fill_versions(apps, schema_editor):
+    ScheduleChange = apps.get_model('main', 'ScheduleChange')
+    ScheduleVersion = apps.get_model('main', 'ScheduleVersion')
+    ScheduleChange.objects.update(version=F('id'))
+    ScheduleVersion.objects.bulk_create([
+        ScheduleVersion(shop_id=row['shop_id'], version=row['last'])
+        for row in ScheduleChange.objects.values('shop_id').annotate(last=Max('id')).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_pushsubscriptions_health'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleVersion',
+            fields=[
+                ('shop_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'schedule_versions',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='schedulechange',
+            name='schedule_ch_shop_id_595bb1_idx',
+        ),
+        migrations.AddField(
+            model_name='schedulechange',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='schedulechange',
+            index=models.Index(fields=['shop_id', 'version'], name='schedule_ch_shop_id_5b2fd4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulechange',
+            index=models.Index(fields=['changed_at'], name='schedule_ch_changed_3c3334_idx'),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+    ]
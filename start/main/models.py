@@ -23,6 +23,19 @@ def transliterate(text):
         result += translit_map.get(char, char)
     return result
 
+class LoadedValuesMixin:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {name: value for name, value in zip(field_names, values) if value is not models.DEFERRED}
+        return instance
+
+    def changed_fields(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return {name for name, value in loaded.items() if getattr(self, name) != value}
+
 # Create your models here.
 class UserProfile(models.Model):
     ROLE_CHOICES = [
@@ -59,6 +72,19 @@ class CoffeeShop(models.Model):
     def __str__(self):
         return self.name
 
+class ShopRate(models.Model):
+    coffee_shop = models.ForeignKey(CoffeeShop, on_delete=models.CASCADE, related_name='rates')
+    hourly_rate = models.IntegerField()
+    effective_from = models.DateField()
+
+    class Meta:
+        unique_together = ['coffee_shop', 'effective_from']
+        db_table = 'shop_rates'
+        ordering = ['coffee_shop', 'effective_from']
+
+    def __str__(self):
+        return f"{self.coffee_shop_id} с {self.effective_from}: {self.hourly_rate}"
+
 class ShopAdmin(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='admin_shops')
     coffee_shop = models.ForeignKey(CoffeeShop, on_delete=models.CASCADE, related_name='admins')
@@ -72,7 +98,7 @@ class ShopAdmin(models.Model):
     def __str__(self):
         return self.user.username
 
-class Worker(models.Model):
+class Worker(LoadedValuesMixin, models.Model):
     HALF_YEAR = 180
 
     name = models.CharField(max_length=50)
@@ -119,9 +145,21 @@ class Worker(models.Model):
             self.save(update_fields=["experience_years"])
         return True
 
+    @property
+    def current_experience_years(self):
+        return self.compute_experience_years()
+
+    @classmethod
+    def persist_experience_years(cls, as_of=None, batch_size=1000):
+        as_of = as_of or timezone.localdate()
+        workers = cls.objects.only('id', 'experience_years', 'start_date_experience_years', 'coffee_shop_id')
+        changed = [w for w in workers.iterator(chunk_size=batch_size) if w.sync_experience_years(as_of=as_of)]
+        cls.objects.bulk_update(changed, ['experience_years'], batch_size=batch_size)
+        return len(changed)
+
     def get_hourly_rate(self, as_of=None):
         as_of = as_of or timezone.localdate()
-        if not self.experience_years:
+        if not self.start_date_experience_years:
             return self.coffee_shop.hourly_rate
 
         days = (as_of - self.start_date_experience_years).days
@@ -134,7 +172,7 @@ class Worker(models.Model):
     def __str__(self):
         return self.name
     
-class Shift(models.Model):
+class Shift(LoadedValuesMixin, models.Model):
     worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='shifts')
     coffee_shop = models.ForeignKey(CoffeeShop, on_delete=models.CASCADE, related_name='shifts')
     date = models.DateField()
@@ -153,7 +191,85 @@ class Shift(models.Model):
         return self.worker.name
 
 
-class ShiftRequest(models.Model):
+class PayrollEntry(models.Model):
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='payroll_entries')
+    date = models.DateField()
+    shop = models.ForeignKey(CoffeeShop, on_delete=models.CASCADE, related_name='payroll_entries')
+    is_plus = models.BooleanField(default=False)
+    base_rate = models.IntegerField()
+    experience_bonus = models.IntegerField(default=0)
+    plus_bonus = models.IntegerField(default=0)
+    amount = models.IntegerField()
+
+    class Meta:
+        unique_together = ['worker', 'date']
+        db_table = 'payroll_entries'
+        indexes = [models.Index(fields=['date', 'worker']), models.Index(fields=['shop', 'date'])]
+
+    def __str__(self):
+        return f"{self.worker_id} {self.date}: {self.amount}"
+
+
+class ScheduleVersion(models.Model):
+    shop_id = models.BigIntegerField(primary_key=True)
+    version = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'schedule_versions'
+
+
+class ScheduleChange(models.Model):
+    shop_id = models.BigIntegerField()
+    version = models.BigIntegerField(default=0)
+    worker_id = models.BigIntegerField(null=True, blank=True)
+    date = models.DateField(null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'schedule_changes'
+        indexes = [models.Index(fields=['shop_id', 'version']), models.Index(fields=['changed_at'])]
+
+
+class StaffingAlert(models.Model):
+    coffee_shop = models.ForeignKey(CoffeeShop, on_delete=models.CASCADE, related_name='staffing_alerts')
+    date = models.DateField()
+    workers_count = models.IntegerField()
+    pending = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['coffee_shop', 'date']
+        db_table = 'staffing_alerts'
+        indexes = [models.Index(fields=['date']), models.Index(fields=['pending', 'updated_at'])]
+
+
+class SchedulerJob(models.Model):
+    id = models.CharField(max_length=191, primary_key=True)
+    next_run_time = models.FloatField(null=True, blank=True, db_index=True)
+    job_state = models.BinaryField()
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    run_count = models.IntegerField(default=0)
+    failure_count = models.IntegerField(default=0)
+    total_duration = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'scheduler_jobs'
+
+
+class SchedulerLease(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    owner = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'scheduler_leases'
+
+
+class ShiftRequest(LoadedValuesMixin, models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Ожидает подтверждения'),
         ('APPROVED', 'Подтверждено'),
@@ -196,6 +312,36 @@ class PushSubscriptions(models.Model):
     auth = models.CharField(max_length=100)
     p256dh = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    failure_count = models.PositiveIntegerField(default=0)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    retry_after = models.DateTimeField(null=True, blank=True, db_index=True)
+
+class PushMessage(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Ожидает отправки'),
+        ('FAILED', 'Не доставлено'),
+    ]
+
+    subscription = models.ForeignKey(PushSubscriptions, on_delete=models.CASCADE, related_name='outbox')
+    topic = models.CharField(max_length=100, blank=True, default='')
+    items = models.JSONField(default=list)
+    payload = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'push_outbox'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['subscription', 'id']),
+            models.Index(fields=['subscription', 'topic', 'status']),
+        ]
 
 class HelpItem(models.Model):
     CATEGORY_CHOICES = [
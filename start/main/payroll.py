@@ -0,0 +1,96 @@
+from django.db.models import Count, Sum
+from .models import PayrollEntry, Worker
+from .shop_registry import shops as shop_registry
+from .rates import RateTimeline
+
+PLUS_BONUS = 500
+EXPERIENCE_STEP_BONUS = 100
+
+def experience_bonus(worker, as_of):
+    if not worker.start_date_experience_years:
+        return 0
+    days = (as_of - worker.start_date_experience_years).days
+    return max(0, days // worker.HALF_YEAR) * EXPERIENCE_STEP_BONUS
+
+def format_breakdown(shop_counts, plus_count):
+    parts = [f"{count} {code}" for code, count in sorted(shop_counts.items(), key=lambda item: (-item[1], item[0]))]
+    if plus_count > 0:
+        parts.append(f"({'+' * plus_count})")
+    return " + ".join(parts)
+
+def payroll_groups(date_from, date_to, worker_ids=None):
+    qs = PayrollEntry.objects.filter(date__gte=date_from, date__lte=date_to)
+    if worker_ids is not None:
+        qs = qs.filter(worker_id__in=list(worker_ids))
+    return (
+        qs.values('worker_id', 'shop_id', 'is_plus')
+        .annotate(shifts_count=Count('id'), amount_total=Sum('amount'))
+        .order_by()
+    )
+
+class PayrollReport:
+    def __init__(self, date_from, date_to, stats):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.stats = stats
+
+    @classmethod
+    def build(cls, date_from, date_to, shop_ids=None):
+        groups = {}
+        for row in payroll_groups(date_from, date_to):
+            groups.setdefault(row['worker_id'], []).append(row)
+
+        workers = Worker.objects.filter(coffee_shop__isnull=False)
+        if shop_ids is not None:
+            workers = workers.filter(coffee_shop_id__in=list(shop_ids))
+
+        shops_by_id = {s.id: s for s in shop_registry.all()}
+        timeline = RateTimeline.load(current={s.id: s.hourly_rate for s in shops_by_id.values()})
+        workers_by_shop = {}
+        for worker in workers.order_by('id'):
+            shop = shops_by_id.get(worker.coffee_shop_id)
+            if shop is None or worker.id not in groups:
+                continue
+            worker.coffee_shop = shop
+            workers_by_shop.setdefault(shop.id, []).append(
+                cls._worker_row(worker, groups[worker.id], shops_by_id, timeline, date_to)
+            )
+
+        stats = [
+            {'shop': shops_by_id[shop_id], 'rate': timeline.rate_for(shop_id, date_to), 'workers': workers_by_shop[shop_id]}
+            for shop_id in sorted(workers_by_shop)
+        ]
+        return cls(date_from, date_to, stats)
+
+    @staticmethod
+    def _worker_row(worker, rows, shops_by_id, timeline, date_to):
+        shifts_count = plus_count = total_salary = 0
+        shop_counts = {}
+        for row in rows:
+            n = row['shifts_count']
+            shifts_count += n
+            total_salary += row['amount_total']
+            if row['is_plus']:
+                plus_count += n
+            shop = shops_by_id.get(row['shop_id'])
+            code = shop.short_code if shop else ''
+            shop_counts[code] = shop_counts.get(code, 0) + n
+
+        return {
+            'worker': worker,
+            'rate': timeline.rate_for(worker.coffee_shop_id, date_to) + experience_bonus(worker, date_to),
+            'shifts_count': shifts_count,
+            'plus_shifts_count': plus_count,
+            'shop_breakdown': shop_counts,
+            'breakdown': format_breakdown(shop_counts, plus_count),
+            'total_salary': total_salary,
+        }
+
+    def rows(self):
+        for entry in self.stats:
+            for row in entry['workers']:
+                yield entry['shop'], row
+
+    @property
+    def total_salary(self):
+        return sum(row['total_salary'] for _, row in self.rows())
@@ -0,0 +1,308 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from py_vapid import Vapid
+from pywebpush import WebPusher, WebPushException
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from .models import PushMessage, PushSubscriptions
+from .scheduler import acquire_lease, release_lease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'push_delivery'
+GONE_STATUSES = (404, 410)
+REJECTED_STATUSES = (400, 413)
+CLAIM_LIMIT = 500
+VAPID_TTL = 12 * 60 * 60
+VAPID_REFRESH_MARGIN = 10 * 60
+
+DIGEST_LINES = 5
+
+def live_subscriptions():
+    return PushSubscriptions.objects.filter(failure_count__lt=settings.PUSH_SUBSCRIPTION_MAX_FAILURES)
+
+def dead_subscriptions(now=None):
+    now = now or timezone.now()
+    stale = now - timedelta(days=settings.PUSH_SUBSCRIPTION_STALE_DAYS)
+    return PushSubscriptions.objects.filter(
+        Q(failure_count__gte=settings.PUSH_SUBSCRIPTION_MAX_FAILURES)
+        | Q(failure_count__gt=0, last_success_at__lt=stale)
+        | Q(failure_count__gt=0, last_success_at__isnull=True, created_at__lt=stale)
+    )
+
+def prune_subscriptions(now=None, dry_run=False):
+    dead = dead_subscriptions(now)
+    if dry_run:
+        return dead.count()
+    deleted, per_model = dead.delete()
+    return per_model.get(PushSubscriptions._meta.label, 0)
+
+def purge_failed(now=None, dry_run=False):
+    now = now or timezone.now()
+    failed = PushMessage.objects.filter(
+        status='FAILED', created_at__lt=now - timedelta(days=settings.PUSH_FAILED_RETENTION_DAYS),
+    )
+    if dry_run:
+        return failed.count()
+    return failed.delete()[0]
+
+def prune(now=None, dry_run=False):
+    return prune_subscriptions(now, dry_run), purge_failed(now, dry_run)
+
+def render_payload(items):
+    if len(items) == 1:
+        return json.dumps(items[0])
+    titles = {item['title'] for item in items}
+    title = items[0]['title'] if len(titles) == 1 else "Новые уведомления"
+    lines = [item['body'] for item in items[-DIGEST_LINES:]]
+    if len(items) > DIGEST_LINES:
+        lines.append(f"…и ещё {len(items) - DIGEST_LINES}")
+    return json.dumps({"title": f"{title} ({len(items)})", "body": "\n".join(lines), "url": items[-1]['url']})
+
+def enqueue(users, title, body, url, topic=''):
+    item = {"title": title, "body": body, "url": url}
+    subscription_ids = sorted(set(
+        live_subscriptions().filter(user__in=users).values_list('id', flat=True)
+    ))
+    if not subscription_ids:
+        return []
+    if not topic:
+        return PushMessage.objects.bulk_create(
+            [PushMessage(subscription_id=sub_id, items=[item], payload=render_payload([item])) for sub_id in subscription_ids]
+        )
+    return _merge_into_digests(subscription_ids, item, topic)
+
+@transaction.atomic
+def _merge_into_digests(subscription_ids, item, topic):
+    now = timezone.now()
+    open_digests = {
+        m.subscription_id: m for m in
+        PushMessage.objects.select_for_update().filter(
+            subscription_id__in=subscription_ids, topic=topic, status='PENDING', attempts=0, available_at__gt=now,
+        )
+    }
+    merged, created = [], []
+    for sub_id in subscription_ids:
+        digest = open_digests.get(sub_id)
+        if digest is None:
+            created.append(PushMessage(
+                subscription_id=sub_id, topic=topic, items=[item], payload=render_payload([item]),
+                available_at=now + timedelta(seconds=settings.PUSH_COALESCE_WINDOW),
+            ))
+        elif item not in digest.items:
+            digest.items.append(item)
+            digest.payload = render_payload(digest.items)
+            merged.append(digest)
+    PushMessage.objects.bulk_update(merged, ['items', 'payload'])
+    return merged + PushMessage.objects.bulk_create(created)
+
+def retry_delay(attempts):
+    delay = settings.PUSH_RETRY_BASE * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, 60 * 60) * random.uniform(0.8, 1.2))
+
+def push_origin(endpoint):
+    parsed = urlparse(endpoint)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+class PushSender:
+    def __init__(self, vapid_key=None, admin_email=None, pool_size=None, timeout=10):
+        vapid_key = vapid_key or settings.WEBPUSH_VAPID_PRIVATE_KEY
+        self.vapid = vapid_key if isinstance(vapid_key, Vapid) else Vapid.from_string(private_key=vapid_key)
+        self.subject = f"mailto:{admin_email or settings.WEBPUSH_ADMIN_EMAIL}"
+        self.pool_size = pool_size or settings.PUSH_DELIVERY_WORKERS
+        self.timeout = timeout
+        self._sessions = {}
+        self._headers = {}
+        self._lock = threading.Lock()
+
+    def session(self, origin):
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                session.mount(origin, HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+                self._sessions[origin] = session
+            return session
+
+    def vapid_headers(self, origin):
+        now = time.time()
+        cached = self._headers.get(origin)
+        if cached and cached[1] - VAPID_REFRESH_MARGIN > now:
+            return cached[0]
+        expires = int(now) + VAPID_TTL
+        headers = self.vapid.sign({"sub": self.subject, "aud": origin, "exp": expires})
+        self._headers[origin] = (headers, expires)
+        return headers
+
+    def send(self, subscription, payload):
+        origin = push_origin(subscription.endpoint)
+        response = WebPusher(
+            {"endpoint": subscription.endpoint, "keys": {"auth": subscription.auth, "p256dh": subscription.p256dh}},
+            requests_session=self.session(origin),
+        ).send(payload, dict(self.vapid_headers(origin)), ttl=3600, timeout=self.timeout)
+        if response.status_code > 202:
+            raise WebPushException(f"Push failed: {response.status_code} {response.reason}", response=response)
+        return response
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+def claim_batches(now=None, limit=CLAIM_LIMIT, owner=''):
+    now = now or timezone.now()
+    claim_expired = now - timedelta(seconds=settings.PUSH_CLAIM_TIMEOUT)
+    unclaimed = Q(claimed_at__isnull=True) | Q(claimed_at__lt=claim_expired)
+    retrying_earlier = PushMessage.objects.filter(
+        subscription_id=OuterRef('subscription_id'),
+        id__lt=OuterRef('id'),
+        status='PENDING',
+        attempts__gt=0,
+        available_at__gt=now,
+    )
+    in_flight = PushMessage.objects.filter(
+        subscription_id=OuterRef('subscription_id'),
+        status='PENDING',
+        claimed_at__gte=claim_expired,
+    )
+    with transaction.atomic():
+        ids = list(
+            PushMessage.objects.filter(status='PENDING', available_at__lte=now)
+            .filter(unclaimed)
+            .filter(Q(subscription__retry_after__isnull=True) | Q(subscription__retry_after__lte=now))
+            .filter(~Exists(retrying_earlier), ~Exists(in_flight))
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        PushMessage.objects.filter(unclaimed, id__in=ids).update(claimed_at=now, claimed_by=owner)
+    claimed = (
+        PushMessage.objects.filter(id__in=ids, claimed_at=now, claimed_by=owner)
+        .select_related('subscription')
+        .order_by('id')
+    )
+    batches = {}
+    for message in claimed:
+        batches.setdefault(message.subscription_id, []).append(message)
+    return list(batches.values())
+
+def _release(messages):
+    if messages:
+        PushMessage.objects.filter(
+            id__in=[m.id for m in messages], claimed_at=messages[0].claimed_at, claimed_by=messages[0].claimed_by,
+        ).update(claimed_at=None, claimed_by='')
+
+def deliver_batch(sender, messages):
+    subscription = messages[0].subscription
+    try:
+        for index, message in enumerate(messages):
+            try:
+                sender.send(subscription, message.payload)
+            except WebPushException as ex:
+                status = ex.response.status_code if ex.response is not None else None
+                if status in GONE_STATUSES:
+                    subscription.delete()
+                    return
+                if status in REJECTED_STATUSES:
+                    _reschedule(message, f"{status}: {ex}", final=True)
+                    continue
+                _endpoint_failed(subscription, message, f"{status}: {ex}")
+                _release(messages[index + 1:])
+                return
+            except Exception as ex:
+                _endpoint_failed(subscription, message, repr(ex))
+                _release(messages[index + 1:])
+                return
+            PushMessage.objects.filter(id=message.id).delete()
+        PushSubscriptions.objects.filter(id=subscription.id).update(
+            failure_count=0, last_success_at=timezone.now(), retry_after=None,
+        )
+    finally:
+        close_old_connections()
+
+def _endpoint_failed(subscription, message, error):
+    now = timezone.now()
+    failures = subscription.failure_count + 1
+    PushSubscriptions.objects.filter(id=subscription.id).update(
+        failure_count=F('failure_count') + 1,
+        last_failure_at=now,
+        retry_after=now + retry_delay(failures),
+    )
+    _reschedule(message, error)
+
+def _reschedule(message, error, final=False):
+    attempts = message.attempts + 1
+    if final or attempts >= settings.PUSH_MAX_ATTEMPTS:
+        PushMessage.objects.filter(id=message.id).update(
+            status='FAILED', attempts=attempts, last_error=error, claimed_at=None, claimed_by='',
+        )
+        logger.warning("Push %s failed after %s attempts: %s", message.id, attempts, error)
+        return
+    PushMessage.objects.filter(id=message.id).update(
+        attempts=attempts,
+        available_at=timezone.now() + retry_delay(attempts),
+        last_error=error,
+        claimed_at=None,
+        claimed_by='',
+    )
+
+class PushDeliveryService:
+    def __init__(self, workers=None, poll_interval=1.0, owner=None, lease_ttl=None, pool=None, sender=None):
+        self.workers = workers or settings.PUSH_DELIVERY_WORKERS
+        self.poll_interval = poll_interval
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+        self.lease_ttl = lease_ttl or settings.SCHEDULER_LEASE_TTL
+        self.pool = pool
+        self.sender = sender
+        self.stopping = threading.Event()
+
+    def drain_once(self):
+        if self.sender is None:
+            self.sender = PushSender(pool_size=self.workers)
+        batches = claim_batches(owner=self.owner)
+        if batches:
+            list(self.pool.map(lambda batch: deliver_batch(self.sender, batch), batches))
+        return sum(len(b) for b in batches)
+
+    def run(self, once=False):
+        own_pool = self.pool is None
+        if own_pool:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='push')
+        try:
+            while not self.stopping.is_set():
+                if not acquire_lease(self.owner, self.lease_ttl, LEASE_NAME):
+                    self.stopping.wait(self.lease_ttl / 3)
+                    continue
+                delivered = self.drain_once()
+                if once and not delivered:
+                    break
+                if not delivered:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            if own_pool:
+                self.pool.shutdown(wait=True)
+            if self.sender is not None:
+                self.sender.close()
+            release_lease(self.owner, LEASE_NAME)
+            close_old_connections()
+
+    def stop(self):
+        self.stopping.set()
+
+def start():
+    service = PushDeliveryService()
+    threading.Thread(target=service.run, name='push-delivery', daemon=True).start()
+    return service
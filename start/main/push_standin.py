@@ -0,0 +1,115 @@
+import base64
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_ece
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+RECEIVED_LIMIT = 10000
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        token = self.path.rstrip('/').rsplit('/', 1)[-1]
+        status, headers = self.service.handle(token, body, self.headers.get('Content-Encoding', ''))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class StandInPushService:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, gone_rate=0.0, throttle_rate=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.gone_rate = gone_rate
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.keys = {}
+        self.stats = Counter()
+        self.received = deque(maxlen=RECEIVED_LIMIT)
+        self._lock = threading.Lock()
+        handler = type('Handler', (StandInHandler,), {'service': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def subscribe(self):
+        key = ec.generate_private_key(ec.SECP256R1())
+        auth = os.urandom(16)
+        token = secrets.token_urlsafe(12)
+        with self._lock:
+            self.keys[token] = (key, auth)
+        return {
+            'endpoint': f'{self.url}/push/{token}',
+            'keys': {
+                'p256dh': b64(key.public_key().public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)),
+                'auth': b64(auth),
+            },
+        }
+
+    def _roll(self):
+        with self._lock:
+            roll = self.random.random()
+        for status, rate in ((410, self.gone_rate), (429, self.throttle_rate), (503, self.error_rate)):
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+    def _count(self, status):
+        with self._lock:
+            self.stats[status] += 1
+        return status
+
+    def handle(self, token, body, encoding):
+        if self.latency:
+            time.sleep(self.latency)
+        keys = self.keys.get(token)
+        if keys is None:
+            return self._count(404), {}
+        status = self._roll()
+        if status == 410:
+            with self._lock:
+                self.keys.pop(token, None)
+        if status == 429:
+            return self._count(429), {'Retry-After': '1'}
+        if status:
+            return self._count(status), {}
+        try:
+            payload = http_ece.decrypt(body, private_key=keys[0], auth_secret=keys[1], version=encoding or 'aes128gcm')
+            message = json.loads(payload)
+        except Exception:
+            return self._count(400), {}
+        with self._lock:
+            self.received.append((time.time(), token, message))
+        return self._count(201), {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
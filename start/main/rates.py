@@ -0,0 +1,47 @@
+from bisect import bisect_right
+from django.utils import timezone
+from .models import CoffeeShop, ShopRate
+
+class RateTimeline:
+    def __init__(self, rates, current):
+        self.current = current
+        self.starts = {}
+        self.values = {}
+        for shop_id, effective_from, hourly_rate in rates:
+            self.starts.setdefault(shop_id, []).append(effective_from)
+            self.values.setdefault(shop_id, []).append(hourly_rate)
+
+    @classmethod
+    def load(cls, shop_ids=None, current=None):
+        rates = ShopRate.objects.order_by('coffee_shop_id', 'effective_from')
+        shops = CoffeeShop.objects.all()
+        if shop_ids is not None:
+            shop_ids = list(shop_ids)
+            rates = rates.filter(coffee_shop_id__in=shop_ids)
+            shops = shops.filter(id__in=shop_ids)
+        if current is None:
+            current = dict(shops.values_list('id', 'hourly_rate'))
+        return cls(rates.values_list('coffee_shop_id', 'effective_from', 'hourly_rate'), current)
+
+    def rate_for(self, shop_id, day):
+        starts = self.starts.get(shop_id)
+        if not starts:
+            return self.current[shop_id]
+        return self.values[shop_id][max(0, bisect_right(starts, day) - 1)]
+
+    def intervals(self, shop_id):
+        starts = self.starts.get(shop_id)
+        if not starts:
+            return [(None, None, self.current[shop_id])] if shop_id in self.current else []
+        bounds = [None] + starts[1:]
+        return list(zip(bounds, starts[1:] + [None], self.values[shop_id]))
+
+def record_rate(shop, effective_from=None):
+    effective_from = effective_from or timezone.localdate()
+    latest = ShopRate.objects.filter(coffee_shop=shop, effective_from__lte=effective_from).order_by('-effective_from').first()
+    if latest is not None and latest.hourly_rate == shop.hourly_rate:
+        return None
+    rate, _ = ShopRate.objects.update_or_create(
+        coffee_shop=shop, effective_from=effective_from, defaults={'hourly_rate': shop.hourly_rate},
+    )
+    return rate
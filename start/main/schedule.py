@@ -0,0 +1,135 @@
+import calendar
+from datetime import date, datetime
+from django.db.models import Q
+from .models import Worker, Shift, ShiftRequest
+from .coverage import count_coverage, build_days_info
+
+def get_month_days(year, month):
+    num_days = calendar.monthrange(year, month)[1]
+    return [date(year, month, d) for d in range(1, num_days + 1)]
+
+def get_active_workers(shop, year, month):
+    month_start = date(year, month, 1)
+    return Worker.objects.filter(coffee_shop=shop).filter(Q(fired_at__isnull=True) | Q(fired_at__gt=month_start)).distinct()
+
+def build_schedule_rows(workers, days, shifts_by_day_worker, requests_map=frozenset()):
+    rows = []
+    for worker in workers:
+        cells = [
+            {
+                'date': day,
+                'shift': shifts_by_day_worker.get((worker.id, day)),
+                'has_request': (worker.id, day) in requests_map,
+            }
+            for day in days
+        ]
+        rows.append({'worker': worker, 'cells': cells})
+    return rows
+
+def get_days_with_workers_count(days, shifts_by_day_worker, shop):
+    counts = count_coverage(shifts_by_day_worker.values(), shop.id)
+    return build_days_info(days, counts, shop.minimum_workers)
+
+def load_month_shifts(shop, days):
+    return list(
+        Shift.objects
+        .filter(Q(coffee_shop=shop) | Q(another_shop=shop), date__gte=days[0], date__lte=days[-1])
+        .select_related('worker', 'another_shop')
+        .order_by('worker_id', 'date')
+    )
+
+def load_pending_requests_map(shop, days):
+    pending = ShiftRequest.objects.filter(
+        shift__coffee_shop=shop,
+        shift__date__gte=days[0],
+        shift__date__lte=days[-1],
+        status='PENDING',
+    ).values_list('shift__worker_id', 'shift__date')
+    return set(pending)
+
+def build_month_schedule(shop, year, month):
+    days = get_month_days(year, month)
+    workers = list(get_active_workers(shop, year, month))
+    shifts = load_month_shifts(shop, days)
+    requests_map = load_pending_requests_map(shop, days)
+
+    shifts_by_day_worker = {(s.worker_id, s.date): s for s in shifts}
+
+    worker_ids = {w.id for w in workers}
+    workers_from_other_shops = {}
+    for s in shifts:
+        if s.another_shop_id == shop.id and s.worker_id not in worker_ids:
+            workers_from_other_shops.setdefault(s.worker_id, s.worker)
+    all_workers = workers + [workers_from_other_shops[wid] for wid in sorted(workers_from_other_shops)]
+
+    return {
+        'days': days,
+        'workers': all_workers,
+        'schedule_rows': build_schedule_rows(all_workers, days, shifts_by_day_worker, requests_map),
+        'days_info': get_days_with_workers_count(days, shifts_by_day_worker, shop),
+        'requests_map': requests_map,
+    }
+
+def build_availability_index(dates):
+    index = {d: set() for d in dates}
+    if not index:
+        return index
+    busy = Shift.objects.filter(date__in=index.keys()).values_list('date', 'worker_id')
+    for day, worker_id in busy:
+        index[day].add(worker_id)
+    return index
+
+def get_shift_candidates(shift, exclude_worker_id):
+    busy_ids = Shift.objects.filter(date=shift.date).values('worker_id')
+    return (
+        Worker.objects.exclude(id=exclude_worker_id)
+        .exclude(id__in=busy_ids)
+        .select_related('coffee_shop')
+        .order_by('name', 'id')
+    )
+
+DAY_OFF_VALUES = ('выходной', 'off', 'none')
+
+def is_day_off(raw_value):
+    return not raw_value or raw_value.lower() in DAY_OFF_VALUES
+
+def parse_shift_value(raw_value, get_shop_by_code):
+    fields = {'start_time': None, 'another_shop': None, 'is_plus': False, 'display_text': ''}
+
+    value = raw_value
+    parsed_structured = False
+
+    if '+' in value:
+        fields['is_plus'] = True
+        value = value.replace('+', '').strip()
+
+    tokens = value.split()
+    time_part = None
+    shop_code = None
+
+    if tokens:
+        if ':' in tokens[0]:
+            try:
+                time_part = datetime.strptime(tokens[0], '%H:%M').time()
+                parsed_structured = True
+            except ValueError:
+                time_part = None
+        else:
+            shop_code = tokens[0]
+
+        if time_part and len(tokens) > 1:
+            shop_code = tokens[1]
+
+    if time_part:
+        fields['start_time'] = time_part
+
+    if shop_code:
+        another_shop = get_shop_by_code(shop_code)
+        if another_shop is not None:
+            fields['another_shop'] = another_shop
+            parsed_structured = True
+
+    if not parsed_structured and not fields['is_plus']:
+        fields = {'start_time': None, 'another_shop': None, 'is_plus': False, 'display_text': raw_value}
+
+    return fields
@@ -0,0 +1,92 @@
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from .models import ScheduleVersion
+from .schedule import build_month_schedule
+
+HITS_KEY = 'schedule:stats:hits'
+MISSES_KEY = 'schedule:stats:misses'
+
+def _generation_key(shop_id):
+    return f'schedule:gen:{shop_id}'
+
+def _generation(shop_id):
+    generation = cache.get(_generation_key(shop_id))
+    if generation is None:
+        cache.add(_generation_key(shop_id), uuid.uuid4().hex, None)
+        generation = cache.get(_generation_key(shop_id))
+    return generation
+
+def _month_key(shop_id, generation, year, month):
+    return f'schedule:grid:{shop_id}:{generation}:{year}:{month}'
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+def schedule_version(shop_id):
+    return ScheduleVersion.objects.filter(shop_id=shop_id).values_list('version', flat=True).first() or 0
+
+def _version_key(shop_id):
+    return f'schedule:version:{shop_id}'
+
+def latest_version(shop_id):
+    version = cache.get(_version_key(shop_id))
+    if version is None:
+        version = schedule_version(shop_id)
+        cache.add(_version_key(shop_id), version, settings.SCHEDULE_CACHE_TIMEOUT)
+    return version
+
+def versions_changed(versions):
+    cache.set_many({_version_key(shop_id): version for shop_id, version in versions.items()}, settings.SCHEDULE_CACHE_TIMEOUT)
+
+def get_month_schedule(shop, year, month, min_version=None):
+    key = _month_key(shop.id, _generation(shop.id), year, month)
+    grid = cache.get(key)
+    if grid is not None and (min_version is None or grid['version'] >= min_version):
+        _incr(HITS_KEY)
+        return grid
+
+    _incr(MISSES_KEY)
+    version = schedule_version(shop.id)
+    grid = build_month_schedule(shop, year, month)
+    grid['version'] = version
+    cache.set(key, grid, settings.SCHEDULE_CACHE_TIMEOUT)
+    return grid
+
+def invalidate_months(cells):
+    keys = set()
+    generations = {}
+    for shop_id, day in cells:
+        if shop_id is None or day is None:
+            continue
+        if shop_id not in generations:
+            generations[shop_id] = _generation(shop_id)
+        keys.add(_month_key(shop_id, generations[shop_id], day.year, day.month))
+    if keys:
+        cache.delete_many(list(keys))
+
+def invalidate_shops(shop_ids):
+    for shop_id in set(shop_ids):
+        if shop_id is None:
+            continue
+        cache.set(_generation_key(shop_id), uuid.uuid4().hex, None)
+
+def shift_cells(shift):
+    cells = {(shift.coffee_shop_id, shift.date), (shift.another_shop_id, shift.date)}
+    loaded = getattr(shift, '_loaded_values', None)
+    if loaded:
+        cells.add((loaded.get('coffee_shop_id'), loaded.get('date')))
+        cells.add((loaded.get('another_shop_id'), loaded.get('date')))
+    return cells
+
+def get_stats():
+    hits, misses = (cache.get_many([HITS_KEY, MISSES_KEY]).get(k, 0) for k in (HITS_KEY, MISSES_KEY))
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0.0}
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
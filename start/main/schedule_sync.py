@@ -0,0 +1,178 @@
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from .coverage import coverage_counts, shop_coverage
+from .models import ScheduleChange, ScheduleVersion, Shift, ShiftRequest
+from .schedule import get_month_days
+from . import batching, schedule_cache
+from .broadcast import publish_months, publish_shops
+
+def shift_text(shift):
+    if shift is None:
+        return ''
+    if shift.display_text:
+        return shift.display_text
+    code = shift.another_shop.short_code if shift.another_shop_id else ''
+    plus = '+' if shift.is_plus else ''
+    if shift.start_time:
+        return shift.start_time.strftime('%H:%M') + (f' {code}' if code else '') + plus
+    return code + plus
+
+def serialize_cell(worker_id, day, shift, has_request=False):
+    return {
+        'worker_id': worker_id,
+        'date': day.isoformat(),
+        'text': shift_text(shift),
+        'has_shift': bool(shift and not shift.display_text),
+        'another_shop_id': shift.another_shop_id if shift else None,
+        'has_request': has_request,
+    }
+
+def serialize_days_info(days_info):
+    return [
+        {
+            'date': d['date'].isoformat(),
+            'workers_count': d['workers_count'],
+            'is_understaffed': d['is_understaffed'],
+        }
+        for d in days_info
+    ]
+
+def record_changes(entries):
+    batching.on_commit(_record_changes, entries)
+
+@transaction.atomic
+def _record_changes(entries):
+    by_shop = {}
+    for shop_id, worker_id, day in entries:
+        if shop_id is not None:
+            by_shop.setdefault(shop_id, []).append((worker_id, day))
+    if not by_shop:
+        return
+    locked = ScheduleVersion.objects.select_for_update().filter(shop_id__in=list(by_shop)).order_by('shop_id')
+    counters = list(locked.all())
+    missing = set(by_shop) - {counter.shop_id for counter in counters}
+    if missing:
+        ScheduleVersion.objects.bulk_create([ScheduleVersion(shop_id=shop_id) for shop_id in missing], ignore_conflicts=True)
+        counters = list(locked.all())
+    changes = []
+    for counter in counters:
+        counter.version += 1
+        changes += [
+            ScheduleChange(shop_id=counter.shop_id, version=counter.version, worker_id=worker_id, date=day)
+            for worker_id, day in by_shop[counter.shop_id]
+        ]
+    ScheduleVersion.objects.bulk_update(counters, ['version'])
+    ScheduleChange.objects.bulk_create(changes)
+    # still under the row locks, so concurrent writers update the cached versions in order
+    schedule_cache.versions_changed({counter.shop_id: counter.version for counter in counters})
+
+def prune_changes(now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=settings.SCHEDULE_CHANGE_RETENTION_DAYS)
+    with transaction.atomic():
+        old = ScheduleChange.objects.filter(changed_at__lt=cutoff)
+        for row in old.values('shop_id').annotate(last=Max('version')).order_by():
+            ScheduleVersion.objects.filter(shop_id=row['shop_id'], pruned_through__lt=row['last']).update(
+                pruned_through=row['last'],
+            )
+        return old.delete()[0]
+
+def shift_change_entries(shift):
+    loaded = getattr(shift, '_loaded_values', None) or {}
+    entries = {
+        (shift.coffee_shop_id, shift.worker_id, shift.date),
+        (shift.another_shop_id, shift.worker_id, shift.date),
+    }
+    if loaded:
+        worker_id = loaded.get('worker_id', shift.worker_id)
+        day = loaded.get('date', shift.date)
+        entries.add((loaded.get('coffee_shop_id'), worker_id, day))
+        entries.add((loaded.get('another_shop_id'), worker_id, day))
+    return entries
+
+def current_version(shop):
+    return schedule_cache.schedule_version(shop.id)
+
+def changes_since(shop, since, days):
+    version, pruned_through = (
+        ScheduleVersion.objects.filter(shop_id=shop.id).values_list('version', 'pruned_through').first() or (0, 0)
+    )
+    if since < pruned_through or since > version:
+        return version, True, set()
+    rows = list(
+        ScheduleChange.objects
+        .filter(shop_id=shop.id, version__gt=since, version__lte=version)
+        .filter(Q(date__isnull=True) | Q(date__gte=days[0], date__lte=days[-1]))
+        .values_list('worker_id', 'date')
+    )
+    needs_reload = any(day is None for _, day in rows)
+    cells = {(worker_id, day) for worker_id, day in rows if day is not None and worker_id is not None}
+    return version, needs_reload, cells
+
+def read_cells(shop, cells):
+    worker_ids = {worker_id for worker_id, _ in cells}
+    dates = {day for _, day in cells}
+    shifts = {
+        (s.worker_id, s.date): s
+        for s in Shift.objects.filter(Q(coffee_shop=shop) | Q(another_shop=shop), worker_id__in=worker_ids, date__in=dates)
+        .select_related('another_shop')
+    }
+    requests = set(
+        ShiftRequest.objects.filter(
+            shift__coffee_shop=shop, shift__worker_id__in=worker_ids, shift__date__in=dates, status='PENDING',
+        ).values_list('shift__worker_id', 'shift__date')
+    )
+    return [
+        serialize_cell(worker_id, day, shifts.get((worker_id, day)), (worker_id, day) in requests)
+        for worker_id, day in sorted(cells, key=lambda c: (c[1], c[0]))
+    ]
+
+def serialize_grid(grid):
+    return [
+        serialize_cell(row['worker'].id, cell['date'], cell['shift'], cell['has_request'])
+        for row in grid['schedule_rows']
+        for cell in row['cells']
+    ]
+
+def _months_changed(cells):
+    schedule_cache.invalidate_months(cells)
+    publish_months(cells)
+
+def _shops_changed(shop_ids):
+    schedule_cache.invalidate_shops(shop_ids)
+    publish_shops(shop_ids)
+
+def months_changed(cells):
+    transaction.on_commit(partial(_months_changed, set(cells)))
+
+def shops_changed(shop_ids):
+    transaction.on_commit(partial(_shops_changed, set(shop_ids)))
+
+def schedule_payload(shop, year, month, since=None):
+    days = get_month_days(year, month)
+    if since is not None:
+        version, needs_reload, cells = changes_since(shop, since, days)
+        if not needs_reload:
+            if not cells:
+                return {'version': version, 'full': False, 'cells': []}
+            counts = coverage_counts(days[0], days[-1], [shop])
+            return {
+                'version': version,
+                'full': False,
+                'cells': read_cells(shop, cells),
+                'days_info': serialize_days_info(shop_coverage(shop, days, counts)),
+            }
+    else:
+        version = current_version(shop)
+
+    grid = schedule_cache.get_month_schedule(shop, year, month, min_version=version)
+    return {
+        'version': version,
+        'full': True,
+        'workers': [{'id': w.id, 'name': w.name, 'coffee_shop_id': w.coffee_shop_id} for w in grid['workers']],
+        'cells': serialize_grid(grid),
+        'days_info': serialize_days_info(grid['days_info']),
+    }
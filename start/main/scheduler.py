@@ -1,24 +1,168 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-import logging
+from apscheduler.triggers.interval import IntervalTrigger
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .jobstore import DjangoJobStore
+from .models import SchedulerJob, SchedulerLease
 
 logger = logging.getLogger(__name__)
 
-def start():
-    from main.utils import check_and_notify_understaffing
-    
-    scheduler = BackgroundScheduler()
-    
-    scheduler.add_job(
-        check_and_notify_understaffing,
-        trigger=CronTrigger(hour=10, minute=0),
-        id="check_staffing_job",
-        max_instances=1,
-        replace_existing=True,
-    )
-    
+LEASE_NAME = 'scheduler'
+
+JOBS = {
+    'check_staffing_job': 'main.utils.check_and_notify_understaffing',
+    'sync_experience_job': 'main.models.Worker.persist_experience_years',
+    'flush_staffing_alerts_job': 'main.coverage_alerts.flush_pending',
+    'prune_push_subscriptions_job': 'main.push.prune',
+    'prune_schedule_changes_job': 'main.schedule_sync.prune_changes',
+}
+
+def job_triggers():
+    tz = settings.TIME_ZONE
+    return {
+        'check_staffing_job': CronTrigger(hour=10, minute=0, timezone=tz),
+        'sync_experience_job': CronTrigger(hour=0, minute=5, timezone=tz),
+        'flush_staffing_alerts_job': IntervalTrigger(minutes=1, timezone=tz),
+        'prune_push_subscriptions_job': CronTrigger(hour=3, minute=30, timezone=tz),
+        'prune_schedule_changes_job': CronTrigger(hour=4, minute=0, timezone=tz),
+    }
+
+def _resolve(path):
     try:
-        scheduler.start()
-        logger.info("--- Scheduler started successfully (Daily check at 10:00) ---")
+        return import_string(path)
+    except ImportError:
+        owner, name = path.rsplit('.', 1)
+        return getattr(import_string(owner), name)
+
+def holds_lease(owner, name=LEASE_NAME):
+    return SchedulerLease.objects.filter(name=name, owner=owner, expires_at__gt=timezone.now()).exists()
+
+def run_job(job_id, owner=None):
+    close_old_connections()
+    if owner is not None and not holds_lease(owner):
+        logger.warning("Skipping job %s: %s no longer holds the scheduler lease", job_id, owner)
+        close_old_connections()
+        return
+    started_at = timezone.now()
+    started = time.perf_counter()
+    status, error = 'ok', ''
+    try:
+        _resolve(JOBS[job_id])()
     except Exception as e:
-        logger.error(f"--- Error starting scheduler: {e} ---")
+        status, error = 'error', repr(e)
+        logger.exception("Scheduled job %s failed", job_id)
+    duration = time.perf_counter() - started
+    SchedulerJob.objects.filter(id=job_id).update(
+        last_started_at=started_at,
+        last_duration=duration,
+        last_status=status,
+        last_error=error,
+        run_count=F('run_count') + 1,
+        failure_count=F('failure_count') + (1 if status == 'error' else 0),
+        total_duration=F('total_duration') + duration,
+    )
+    close_old_connections()
+
+def acquire_lease(owner, ttl, name=LEASE_NAME):
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    updated = (
+        SchedulerLease.objects.filter(name=name)
+        .filter(Q(owner=owner) | Q(expires_at__lt=now))
+        .update(owner=owner, expires_at=expires_at)
+    )
+    if updated:
+        return True
+    try:
+        with transaction.atomic():
+            SchedulerLease.objects.create(name=name, owner=owner, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    return True
+
+def release_lease(owner, name=LEASE_NAME):
+    SchedulerLease.objects.filter(name=name, owner=owner).delete()
+
+def sync_jobs(scheduler, owner=None):
+    triggers = job_triggers()
+    for job in scheduler.get_jobs():
+        if job.id not in triggers:
+            job.remove()
+    for job_id, trigger in triggers.items():
+        job = scheduler.get_job(job_id)
+        if job is None:
+            scheduler.add_job(run_job, trigger, args=[job_id, owner], id=job_id, name=job_id)
+            continue
+        if str(job.trigger) != str(trigger):
+            scheduler.reschedule_job(job_id, trigger=trigger)
+        if tuple(job.args) != (job_id, owner):
+            scheduler.modify_job(job_id, args=[job_id, owner])
+
+def build_scheduler(scheduler_class=BackgroundScheduler):
+    return scheduler_class(
+        jobstores={'default': DjangoJobStore()},
+        job_defaults={
+            'coalesce': True,
+            'max_instances': 1,
+            'misfire_grace_time': settings.SCHEDULER_MISFIRE_GRACE_TIME,
+        },
+        timezone=settings.TIME_ZONE,
+    )
+
+class SchedulerService:
+    def __init__(self, owner=None, lease_ttl=None):
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+        self.lease_ttl = lease_ttl or settings.SCHEDULER_LEASE_TTL
+        self.scheduler = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                try:
+                    holds_lease = acquire_lease(self.owner, self.lease_ttl)
+                except Exception:
+                    logger.exception("Scheduler lease check failed")
+                    holds_lease = False
+                if holds_lease and self.scheduler is None:
+                    self._start()
+                elif not holds_lease and self.scheduler is not None:
+                    logger.warning("--- Scheduler lease lost, standing by ---")
+                    self._shutdown()
+                close_old_connections()
+                self.stopping.wait(self.lease_ttl / 3)
+        finally:
+            self._shutdown()
+            release_lease(self.owner)
+            close_old_connections()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _start(self):
+        scheduler = build_scheduler()
+        scheduler.start(paused=True)
+        sync_jobs(scheduler, self.owner)
+        scheduler.resume()
+        self.scheduler = scheduler
+        logger.info("--- Scheduler started as %s ---", self.owner)
+
+    def _shutdown(self):
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=True)
+            self.scheduler = None
+
+def start():
+    service = SchedulerService()
+    threading.Thread(target=service.run, name='scheduler', daemon=True).start()
+    return service
@@ -0,0 +1,73 @@
+import copy
+import threading
+import uuid
+from django.core.cache import cache
+from django.http import Http404
+from .models import CoffeeShop
+
+VERSION_KEY = 'shops:registry:version'
+
+class ShopRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._shops = []
+        self._by_id = {}
+        self._by_slug = {}
+        self._by_code = {}
+
+    def _shared_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _snapshot(self):
+        version = self._shared_version()
+        if version == self._version:
+            return self
+        with self._lock:
+            if version != self._version:
+                shops = list(CoffeeShop.objects.order_by('id'))
+                self._by_id = {s.id: s for s in shops}
+                self._by_slug = {s.slug: s for s in shops}
+                self._by_code = {s.short_code: s for s in shops}
+                self._shops = shops
+                self._version = version
+        return self
+
+    def all(self):
+        return [copy.copy(s) for s in self._snapshot()._shops]
+
+    def get_by_id(self, shop_id):
+        try:
+            shop = self._snapshot()._by_id.get(int(shop_id))
+        except (TypeError, ValueError):
+            return None
+        return copy.copy(shop) if shop else None
+
+    def get_by_slug(self, slug):
+        shop = self._snapshot()._by_slug.get(slug)
+        return copy.copy(shop) if shop else None
+
+    def get_by_code(self, short_code):
+        shop = self._snapshot()._by_code.get(short_code)
+        return copy.copy(shop) if shop else None
+
+    def filter_ids(self, shop_ids):
+        by_id = self._snapshot()._by_id
+        return [copy.copy(by_id[i]) for i in sorted(set(shop_ids)) if i in by_id]
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        with self._lock:
+            self._version = None
+
+shops = ShopRegistry()
+
+def get_shop_or_404(slug):
+    shop = shops.get_by_slug(slug)
+    if shop is None:
+        raise Http404('No CoffeeShop matches the given query.')
+    return shop
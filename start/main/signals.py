@@ -0,0 +1,121 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from .models import CoffeeShop, Worker, Shift, ShiftRequest, ShopAdmin, ShopRate, UserProfile
+from . import coverage_alerts, ledger, schedule_cache, schedule_sync
+from .shop_registry import shops
+from .identity import invalidate_identity
+from .rates import record_rate
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+def shift_changed(sender, instance, created=False, **kwargs):
+    saved = kwargs.get('signal') is post_save
+    if saved and not created and instance.changed_fields() == set():
+        return
+    shifts_changed([instance])
+    if saved and getattr(instance, '_loaded_values', None):
+        instance._loaded_values = {name: getattr(instance, name) for name in instance._loaded_values}
+
+def shifts_changed(shifts):
+    entries, cells, payroll_cells = set(), set(), set()
+    for shift in shifts:
+        entries |= schedule_sync.shift_change_entries(shift)
+        cells |= schedule_cache.shift_cells(shift)
+        loaded = getattr(shift, '_loaded_values', None) or {}
+        payroll_cells |= {(shift.worker_id, shift.date), (loaded.get('worker_id'), loaded.get('date'))}
+    schedule_sync.record_changes(entries)
+    schedule_sync.months_changed(cells)
+    coverage_alerts.cells_changed(cells)
+    ledger.cells_changed(payroll_cells)
+
+@receiver(post_save, sender=ShiftRequest)
+@receiver(post_delete, sender=ShiftRequest)
+def shift_request_changed(sender, instance, created=False, **kwargs):
+    changed = instance.changed_fields()
+    if kwargs.get('signal') is post_save and not created and changed is not None and not changed & {'status', 'shift_id'}:
+        return
+    shift_ids = {instance.shift_id, (getattr(instance, '_loaded_values', None) or {}).get('shift_id')} - {None}
+    if not shift_ids:
+        return
+    entries = list(Shift.objects.filter(id__in=shift_ids).values_list('coffee_shop_id', 'worker_id', 'date'))
+    schedule_sync.record_changes(entries)
+    schedule_sync.months_changed((shop_id, day) for shop_id, _, day in entries)
+    if changed:
+        instance._loaded_values = {name: getattr(instance, name) for name in instance._loaded_values}
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+def worker_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'experience_years'}:
+        return
+    shop_ids = {instance.coffee_shop_id, (getattr(instance, '_loaded_values', None) or {}).get('coffee_shop_id')}
+    if kwargs.get('signal') is post_save:
+        shop_ids |= set(
+            Shift.objects.filter(worker=instance, another_shop__isnull=False)
+            .values_list('another_shop_id', flat=True).distinct()
+        )
+    schedule_sync.record_changes((shop_id, instance.id, None) for shop_id in shop_ids)
+    schedule_sync.shops_changed(shop_ids)
+
+@receiver(post_save, sender=CoffeeShop)
+@receiver(post_delete, sender=CoffeeShop)
+def coffee_shop_changed(sender, instance, **kwargs):
+    shop_ids = set(CoffeeShop.objects.values_list('id', flat=True))
+    schedule_sync.record_changes((shop_id, None, None) for shop_id in shop_ids)
+    shop_ids.add(instance.id)
+    schedule_sync.shops_changed(shop_ids)
+    transaction.on_commit(shops.invalidate)
+
+@receiver(post_save, sender=Worker)
+def worker_experience_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields and 'start_date_experience_years' not in update_fields):
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if 'start_date_experience_years' in loaded and loaded['start_date_experience_years'] == instance.start_date_experience_years:
+        return
+    ledger.rebuild(worker_ids=[instance.id])
+
+@receiver(post_save, sender=CoffeeShop)
+def coffee_shop_rate_changed(sender, instance, **kwargs):
+    if getattr(instance, '_defer_rate_record', False):
+        return
+    record_rate(instance)
+
+@receiver(post_save, sender=ShopRate)
+@receiver(post_delete, sender=ShopRate)
+def shop_rate_changed(sender, instance, **kwargs):
+    ledger.reprice_shop(instance.coffee_shop_id)
+
+@receiver(pre_delete, sender=CoffeeShop)
+def coffee_shop_deleting(sender, instance, **kwargs):
+    instance._guest_payroll_cells = set(
+        Shift.objects.filter(another_shop=instance).values_list('worker_id', 'date')
+    )
+
+@receiver(post_delete, sender=CoffeeShop)
+def coffee_shop_deleted(sender, instance, **kwargs):
+    ledger.cells_changed(getattr(instance, '_guest_payroll_cells', ()))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_identity, [instance.id]))
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=ShopAdmin)
+@receiver(post_delete, sender=ShopAdmin)
+def user_assignment_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_identity, [instance.user_id]))
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+def worker_identity_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & {'user', 'coffee_shop'}:
+        return
+    loaded_user_id = (getattr(instance, '_loaded_values', None) or {}).get('user_id')
+    transaction.on_commit(partial(invalidate_identity, [instance.user_id, loaded_user_id]))
@@ -0,0 +1,133 @@
+import random
+from datetime import time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from . import ledger, schedule_sync
+from .models import CoffeeShop, Shift, ShiftRequest, ShopAdmin, UserProfile, Worker
+from .schedule import get_month_days
+
+BATCH_SIZE = 2000
+WORK_RATIO = 0.6
+GUEST_RATIO = 0.08
+PLUS_RATIO = 0.15
+NOTE_RATIO = 0.01
+REQUEST_RATIO = 0.03
+START_TIMES = [time(7, 30), time(8, 0), time(9, 0), time(10, 0), time(12, 0), time(14, 0)]
+NOTES = ['Отпуск', 'Больничный', 'Учёба']
+REASONS = ['Семейные обстоятельства', 'Учёба', 'Заболел', 'Поменялись с коллегой']
+FIRST_NAMES = ['Анна', 'Иван', 'Мария', 'Олег', 'Дарья', 'Павел', 'Ксения', 'Артём', 'Софья', 'Никита']
+LAST_NAMES = ['Иванова', 'Петров', 'Смирнова', 'Козлов', 'Волкова', 'Соколов', 'Морозова', 'Лебедев']
+PASSWORD = 'synthetic'
+
+def recent_months(count, today=None):
+    today = today or timezone.localdate()
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months[::-1]
+
+def _phone(rng):
+    return f'+79{rng.randrange(10 ** 9):09d}'
+
+def _make_shift(rng, worker, day, shops):
+    if rng.random() < NOTE_RATIO:
+        return Shift(worker=worker, coffee_shop_id=worker.coffee_shop_id, date=day, display_text=rng.choice(NOTES))
+    another_shop = None
+    if len(shops) > 1 and rng.random() < GUEST_RATIO:
+        another_shop = rng.choice([s for s in shops if s.id != worker.coffee_shop_id])
+    return Shift(
+        worker=worker,
+        coffee_shop_id=worker.coffee_shop_id,
+        date=day,
+        start_time=rng.choice(START_TIMES),
+        another_shop=another_shop,
+        is_plus=rng.random() < PLUS_RATIO,
+    )
+
+def generate(shops=3, workers=15, months=3, prefix='syn', seed=0, today=None):
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    month_list = recent_months(months, today)
+    days = [day for year, month in month_list for day in get_month_days(year, month)]
+
+    with transaction.atomic():
+        shop_objects = [
+            CoffeeShop.objects.create(
+                name=f'{prefix} {n + 1}',
+                slug=f'{prefix}-{n + 1}',
+                short_code=f'{prefix[:3].upper()}{n + 1}',
+                minimum_workers=max(1, workers // 4),
+            )
+            for n in range(shops)
+        ]
+
+        usernames = [f'{prefix}_admin']
+        usernames += [f'{prefix}_shop{n + 1}' for n in range(shops)]
+        usernames += [f'{prefix}_w{n + 1}_{m + 1}' for n in range(shops) for m in range(workers)]
+        users = User.objects.bulk_create([User(username=name, password=password) for name in usernames])
+        super_admin, shop_admins, worker_users = users[0], users[1:shops + 1], users[shops + 1:]
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=super_admin, role='SUPER_ADMIN')]
+            + [UserProfile(user=user, role='SHOP_ADMIN') for user in shop_admins]
+            + [UserProfile(user=user, role='WORKER') for user in worker_users]
+        )
+        ShopAdmin.objects.bulk_create([
+            ShopAdmin(user=user, coffee_shop=shop) for user, shop in zip(shop_admins, shop_objects)
+        ])
+
+        worker_objects = [
+            Worker(
+                coffee_shop=shop_objects[n // workers],
+                name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                phone_number=_phone(rng),
+                start_date_experience_years=days[0] - timedelta(days=rng.randrange(5 * 365)),
+                user=user,
+            )
+            for n, user in enumerate(worker_users)
+        ]
+        for worker in worker_objects:
+            worker.sync_experience_years()
+        Worker.objects.bulk_create(worker_objects)
+
+        shift_count = 0
+        batch = []
+        for worker in worker_objects:
+            for day in days:
+                if rng.random() >= WORK_RATIO:
+                    continue
+                batch.append(_make_shift(rng, worker, day, shop_objects))
+                if len(batch) >= BATCH_SIZE:
+                    shift_count += len(Shift.objects.bulk_create(batch))
+                    batch = []
+        shift_count += len(Shift.objects.bulk_create(batch))
+
+        shifts = Shift.objects.filter(worker__in=worker_objects, display_text='').values_list('id', 'worker_id')
+        requests = []
+        for shift_id, worker_id in shifts.iterator(chunk_size=BATCH_SIZE):
+            if rng.random() < REQUEST_RATIO:
+                requests.append(ShiftRequest(
+                    shift_id=shift_id,
+                    worker_id=worker_id,
+                    reason=rng.choice(REASONS),
+                    status=rng.choice(['PENDING', 'PENDING', 'APPROVED', 'REJECTED']),
+                ))
+        ShiftRequest.objects.bulk_create(requests, batch_size=BATCH_SIZE)
+
+        entries = ledger.rebuild(days[0], days[-1], [w.id for w in worker_objects])
+        schedule_sync.shops_changed([s.id for s in shop_objects])
+
+    return {
+        'shops': shop_objects,
+        'workers': worker_objects,
+        'super_admin': super_admin,
+        'shop_admins': shop_admins,
+        'shifts': shift_count,
+        'requests': len(requests),
+        'payroll_entries': entries,
+        'date_from': days[0],
+        'date_to': days[-1],
+    }
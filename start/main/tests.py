@@ -1,3 +1,1154 @@
-from django.test import TestCase
+import asyncio
+import time as time_module
+import json
+import csv
+import io
+import zipfile
+import requests
+from apscheduler.schedulers.base import BaseScheduler
+from py_vapid import Vapid
+from pywebpush import WebPushException
+from unittest import mock
+from datetime import date, time, timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from .models import CoffeeShop, Worker, Shift, ShiftRequest, ShopAdmin, UserProfile
+from .schedule import build_month_schedule
+from .coverage import coverage_counts, shop_coverage
+from . import schedule_cache, schedule_sync
+from .broadcast import ScheduleBroadcaster
+from .shop_registry import VERSION_KEY, ShopRegistry, shops
+from .middleware import LoginRequiredMiddleware
+from .payroll import PayrollReport
+from .utils import check_and_notify_understaffing, notify_understaffed, send_push_notification
+from . import coverage_alerts, ledger
+from .models import PayrollEntry, ScheduleChange, ScheduleVersion, PushMessage, PushSubscriptions, SchedulerJob, ShopRate, StaffingAlert
+from . import push
+from .push_standin import StandInPushService
+from .synthetic import generate
+from .checks import shared_cache_check
+from . import scheduler as job_scheduler
 
-# Create your tests here.
+
+class ScheduleGridTests(TestCase):
+    def setUp(self):
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', minimum_workers=2)
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR')
+
+    def fill(self, workers_count):
+        for i in range(workers_count):
+            worker = Worker.objects.create(name=f'w{self.shop.id}-{i}', phone_number='+79000000000', coffee_shop=self.shop)
+            guest = Worker.objects.create(name=f'g{self.other.id}-{i}', phone_number='+79000000000', coffee_shop=self.other)
+            for day in range(1, 29, 2):
+                shift = Shift.objects.create(worker=worker, coffee_shop=self.shop, date=date(2025, 2, day), start_time=time(8, 0))
+                Shift.objects.create(worker=guest, coffee_shop=self.other, another_shop=self.shop, date=date(2025, 2, day + 1))
+            ShiftRequest.objects.create(shift=shift, worker=worker, reason='')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            build_month_schedule(self.shop, 2025, 2)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_depend_on_size(self):
+        self.fill(2)
+        small = self.count_queries()
+        self.fill(20)
+        self.assertEqual(small, self.count_queries())
+
+    def test_grid_contents(self):
+        self.fill(1)
+        grid = build_month_schedule(self.shop, 2025, 2)
+        self.assertEqual(len(grid['days']), 28)
+        self.assertEqual([r['worker'].coffee_shop_id for r in grid['schedule_rows']], [self.shop.id, self.other.id])
+
+        home_cells = grid['schedule_rows'][0]['cells']
+        self.assertEqual(home_cells[0]['shift'].start_time, time(8, 0))
+        self.assertIsNone(home_cells[1]['shift'])
+        self.assertTrue(home_cells[26]['has_request'])
+
+        guest_cells = grid['schedule_rows'][1]['cells']
+        self.assertEqual(guest_cells[1]['shift'].another_shop, self.shop)
+        self.assertEqual([d['workers_count'] for d in grid['days_info'][:3]], [1, 1, 1])
+
+
+class CoverageTests(TestCase):
+    def test_grouped_counts_follow_effective_shop(self):
+        shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', minimum_workers=2)
+        other = CoffeeShop.objects.create(name='Парк', short_code='PAR', minimum_workers=1)
+        day = date(2025, 3, 10)
+        workers = [Worker.objects.create(name=f'w{i}', phone_number='+79000000000', coffee_shop=shop) for i in range(4)]
+        Shift.objects.create(worker=workers[0], coffee_shop=shop, date=day)
+        Shift.objects.create(worker=workers[1], coffee_shop=shop, another_shop=other, date=day)
+        Shift.objects.create(worker=workers[2], coffee_shop=shop, date=day, display_text='больничный')
+        Shift.objects.create(worker=workers[3], coffee_shop=shop, date=day + timedelta(days=1))
+
+        with self.assertNumQueries(1):
+            counts = coverage_counts(day, day + timedelta(days=1))
+        self.assertEqual(counts, {(shop.id, day): 1, (other.id, day): 1, (shop.id, day + timedelta(days=1)): 1})
+
+        info = shop_coverage(shop, [day], counts)[0]
+        self.assertEqual((info['workers_count'], info['shortage'], info['is_understaffed']), (1, 1, True))
+        self.assertFalse(shop_coverage(other, [day], counts)[0]['is_understaffed'])
+
+
+class ShiftExchangePickerTests(TestCase):
+    def setUp(self):
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+        self.user = User.objects.create_user('worker', password='pass')
+        self.worker = Worker.objects.create(name='Я', phone_number='+79000000000', coffee_shop=self.shop, user=self.user)
+        self.colleagues = [
+            Worker.objects.create(name=f'Коллега {i:02}', phone_number='+79000000000', coffee_shop=self.shop)
+            for i in range(60)
+        ]
+        self.today = timezone.now().date()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def add_future_shifts(self, count):
+        existing = Shift.objects.filter(worker=self.worker).count()
+        return [
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=self.today + timedelta(days=existing + i))
+            for i in range(count)
+        ]
+
+    def schedule_queries(self):
+        url = reverse('main:schedule', args=[self.shop.slug, self.today.year, self.today.month])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_worker_page_query_count_does_not_depend_on_future_shifts(self):
+        self.add_future_shifts(1)
+        self.schedule_queries()
+        few = self.schedule_queries()
+        self.add_future_shifts(10)
+        self.schedule_queries()
+        self.assertEqual(few, self.schedule_queries())
+
+    def test_candidates_are_paginated_and_skip_busy_workers(self):
+        shift = self.add_future_shifts(1)[0]
+        Shift.objects.create(worker=self.colleagues[0], coffee_shop=self.shop, date=shift.date)
+        url = reverse('main:shift_candidates', args=[shift.id])
+
+        first = self.client.get(url).json()
+        self.assertTrue(first['has_next'])
+        self.assertEqual(len(first['results']), 50)
+        second = self.client.get(url, {'page': 2}).json()
+        self.assertFalse(second['has_next'])
+
+        ids = {w['id'] for w in first['results'] + second['results']}
+        self.assertEqual(len(ids), 59)
+        self.assertNotIn(self.colleagues[0].id, ids)
+        self.assertNotIn(self.worker.id, ids)
+
+    def test_candidates_of_foreign_shift_are_forbidden(self):
+        shift = Shift.objects.create(worker=self.colleagues[0], coffee_shop=self.shop, date=self.today)
+        response = self.client.get(reverse('main:shift_candidates', args=[shift.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkScheduleUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR')
+        self.admin = User.objects.create_user('admin', password='pass')
+        UserProfile.objects.create(user=self.admin, role='SHOP_ADMIN')
+        ShopAdmin.objects.create(user=self.admin, coffee_shop=self.shop)
+        self.workers = [Worker.objects.create(name=f'w{i}', phone_number='+79000000000', coffee_shop=self.shop) for i in range(3)]
+        self.stranger = Worker.objects.create(name='s', phone_number='+79000000000', coffee_shop=self.other)
+        self.client.force_login(self.admin)
+
+    def post(self, cells):
+        return self.client.post(reverse('main:bulk_update_shifts'), {'cells': cells}, content_type='application/json')
+
+    def cell(self, worker, day, value, shop=None):
+        return {'worker_id': worker.id, 'coffee_shop_id': (shop or self.shop).id, 'date': f'2025-04-{day:02}', 'value': value}
+
+    def test_applies_grammar_and_reports_per_cell(self):
+        Shift.objects.create(worker=self.workers[1], coffee_shop=self.shop, date=date(2025, 4, 1))
+        Shift.objects.create(worker=self.workers[2], coffee_shop=self.shop, date=date(2025, 4, 1))
+        response = self.post([
+            self.cell(self.workers[0], 1, '08:00 PAR+'),
+            self.cell(self.workers[1], 1, 'отпуск'),
+            self.cell(self.workers[2], 1, 'выходной'),
+            self.cell(self.stranger, 1, '08:00'),
+            self.cell(self.stranger, 1, '08:00', shop=self.other),
+            {'worker_id': self.workers[0].id},
+        ])
+        data = response.json()
+        self.assertFalse(data['ok'])
+        self.assertEqual([r['ok'] for r in data['results']], [True, True, True, False, False, False])
+        self.assertEqual([r.get('status') for r in data['results'][3:]], [403, 403, 400])
+
+        created = Shift.objects.get(worker=self.workers[0])
+        self.assertEqual((created.start_time, created.another_shop, created.is_plus), (time(8, 0), self.other, True))
+        updated = Shift.objects.get(worker=self.workers[1])
+        self.assertEqual((updated.display_text, updated.start_time), ('отпуск', None))
+        self.assertFalse(Shift.objects.filter(worker=self.workers[2]).exists())
+        self.assertFalse(Shift.objects.filter(worker=self.stranger).exists())
+
+    def test_query_count_does_not_depend_on_cell_count(self):
+        self.post([self.cell(self.workers[0], 30, '+')])
+
+        def queries(cells):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertTrue(self.post(cells).json()['ok'])
+            return len(ctx.captured_queries)
+
+        few = queries([self.cell(self.workers[0], 30, '08:00'), self.cell(self.workers[0], 1, '08:00')])
+        many = queries([self.cell(w, d, '09:30') for w in self.workers for d in range(1, 29)])
+        self.assertEqual(few, many)
+
+
+class ScheduleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR')
+        self.worker = Worker.objects.create(name='w', phone_number='+79000000000', coffee_shop=self.shop)
+        self.guest = Worker.objects.create(name='g', phone_number='+79000000000', coffee_shop=self.other)
+
+    def grid(self, shop=None):
+        return schedule_cache.get_month_schedule(shop or self.shop, 2025, 5)
+
+    def cell(self, grid, worker, day):
+        row = next(r for r in grid['schedule_rows'] if r['worker'].id == worker.id)
+        return row['cells'][day - 1]
+
+    def test_hits_and_misses_are_counted(self):
+        self.grid()
+        with self.assertNumQueries(0):
+            self.grid()
+        self.assertEqual(schedule_cache.get_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+        schedule_cache.reset_stats()
+        self.assertEqual(schedule_cache.get_stats()['misses'], 0)
+
+    def test_evicted_generation_does_not_revive_old_grids(self):
+        self.grid()
+        schedule_cache.invalidate_shops([self.shop.id])
+        self.grid()
+        cache.delete(schedule_cache._generation_key(self.shop.id))
+        self.grid()
+        self.assertEqual(schedule_cache.get_stats()['hits'], 0)
+
+    def test_shift_changes_invalidate_both_shops(self):
+        self.grid()
+        self.grid(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            shift = Shift.objects.create(worker=self.guest, coffee_shop=self.other, another_shop=self.shop, date=date(2025, 5, 3))
+        self.assertEqual(self.cell(self.grid(), self.guest, 3)['shift'].id, shift.id)
+        self.assertEqual(self.cell(self.grid(self.other), self.guest, 3)['shift'].id, shift.id)
+
+        shift = Shift.objects.get(id=shift.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            shift.another_shop = None
+            shift.save()
+        self.assertFalse(any(r['worker'].id == self.guest.id for r in self.grid()['schedule_rows']))
+
+    def test_request_and_worker_changes_invalidate(self):
+        shift = Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 5, 7))
+        self.assertFalse(self.cell(self.grid(), self.worker, 7)['has_request'])
+        with self.captureOnCommitCallbacks(execute=True):
+            ShiftRequest.objects.create(shift=shift, worker=self.worker, reason='')
+        self.assertTrue(self.cell(self.grid(), self.worker, 7)['has_request'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.name = 'renamed'
+            self.worker.save()
+        self.assertEqual(self.grid()['workers'][0].name, 'renamed')
+
+
+class ScheduleDeltaSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+            self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR')
+            self.worker = Worker.objects.create(name='w', phone_number='+79000000000', coffee_shop=self.shop)
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pass'))
+        self.url = reverse('main:schedule_data', args=[self.shop.slug, 2025, 6])
+
+    def fetch(self, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url, params).json()
+
+    def test_full_then_delta(self):
+        Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 1), start_time=time(8, 0))
+        full = self.fetch()
+        self.assertTrue(full['full'])
+        self.assertEqual(len(full['cells']), 30)
+        self.assertEqual(full['cells'][0]['text'], '08:00')
+
+        self.assertEqual(self.fetch(since=full['version'])['cells'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, another_shop=self.other, date=date(2025, 6, 2), is_plus=True)
+            Shift.objects.filter(worker=self.worker, date=date(2025, 6, 1)).delete()
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 7, 1))
+
+        delta = self.fetch(since=full['version'])
+        self.assertFalse(delta['full'])
+        self.assertGreater(delta['version'], full['version'])
+        self.assertEqual([(c['date'], c['text']) for c in delta['cells']], [('2025-06-01', ''), ('2025-06-02', 'PAR+')])
+        self.assertEqual(self.fetch(since=delta['version'])['cells'], [])
+
+    def test_worker_change_forces_full_reload(self):
+        version = self.fetch()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            Worker.objects.create(name='new', phone_number='+79000000000', coffee_shop=self.shop)
+        data = self.fetch(since=version)
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['workers']), 2)
+
+    def test_versions_are_bumped_once_per_shop_and_transaction(self):
+        before = dict(ScheduleVersion.objects.values_list('shop_id', 'version'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 1))
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, another_shop=self.other, date=date(2025, 6, 2))
+        versions = dict(ScheduleVersion.objects.values_list('shop_id', 'version'))
+        self.assertEqual(versions, {self.shop.id: before[self.shop.id] + 1, self.other.id: before[self.other.id] + 1})
+        self.assertEqual(
+            set(ScheduleChange.objects.filter(shop_id=self.other.id).values_list('version', flat=True)),
+            set(range(1, versions[self.other.id] + 1)),
+        )
+
+    def test_delta_reads_cells_from_database_not_cache(self):
+        version = self.fetch()['version']
+        with mock.patch.object(schedule_cache, 'invalidate_months'), self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 3), start_time=time(9, 0))
+        delta = self.client.get(self.url, {'since': version}).json()
+        self.assertFalse(delta['full'])
+        self.assertEqual([(c['date'], c['text']) for c in delta['cells']], [('2025-06-03', '09:00')])
+        self.assertEqual(delta['days_info'][2]['workers_count'], 1)
+
+        full = self.client.get(self.url).json()
+        self.assertEqual(full['cells'][2]['text'], '09:00')
+
+    def test_unchanged_saves_are_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shift = Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 5), start_time=time(9, 0))
+        shift = Shift.objects.get(id=shift.id)
+        version = self.fetch()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            shift.start_time = time(9, 0)
+            shift.save()
+            self.post_cell('09:00')
+        self.assertEqual(self.fetch(since=version)['version'], version)
+
+        with mock.patch.object(schedule_sync, '_record_changes', wraps=schedule_sync._record_changes) as record:
+            with self.captureOnCommitCallbacks(execute=True):
+                shift.start_time = time(10, 0)
+                shift.save()
+                shift.start_time = time(9, 0)
+                shift.save()
+        record.assert_called_once()
+        delta = self.fetch(since=version)
+        self.assertEqual(delta['version'], version + 1)
+        self.assertEqual([c['text'] for c in delta['cells']], ['09:00'])
+
+    def test_latest_version_is_served_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 6))
+        version = ScheduleVersion.objects.get(shop_id=self.shop.id).version
+        with self.assertNumQueries(0):
+            self.assertEqual(schedule_cache.latest_version(self.shop.id), version)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(schedule_cache.latest_version(self.shop.id), version)
+
+    def test_pending_requests_are_marked_in_full_and_delta_payloads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shift = Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 7), start_time=time(9, 0))
+        version = self.fetch()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            ShiftRequest.objects.create(shift=shift, worker=self.worker, reason='')
+        self.assertEqual([c['has_request'] for c in self.fetch(since=version)['cells']], [True])
+        response = self.client.get(reverse('main:schedule', args=[self.shop.slug, 2025, 6]))
+        self.assertContains(response, 'class="schedule-cell schedule-cell-request"', count=1)
+
+    def post_cell(self, value):
+        response = self.client.post(
+            reverse('main:bulk_update_shifts'),
+            {'cells': [{'worker_id': self.worker.id, 'coffee_shop_id': self.shop.id, 'date': '2025-06-05', 'value': value}]},
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['ok'])
+
+    def test_pruned_changes_force_full_reload(self):
+        version = self.fetch()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 6, 4))
+        latest = self.fetch(since=version)['version']
+        self.assertGreater(schedule_sync.prune_changes(timezone.now() + timedelta(days=settings.SCHEDULE_CHANGE_RETENTION_DAYS + 1)), 0)
+        self.assertFalse(ScheduleChange.objects.exists())
+        self.assertTrue(self.fetch(since=version)['full'])
+        self.assertEqual(self.fetch(since=latest)['cells'], [])
+
+
+class ScheduleBroadcasterTests(SimpleTestCase):
+    def test_publish_wakes_only_matching_subscribers_and_coalesces(self):
+        async def scenario():
+            broadcaster = ScheduleBroadcaster()
+            june = broadcaster.subscribe(1, 2025, 6)
+            july = broadcaster.subscribe(1, 2025, 7)
+            other = broadcaster.subscribe(2, 2025, 6)
+
+            broadcaster.publish(1, 2025, 6)
+            broadcaster.publish(1, 2025, 6)
+            await asyncio.sleep(0)
+            self.assertEqual([june[1].qsize(), july[1].qsize(), other[1].qsize()], [1, 0, 0])
+
+            broadcaster.publish(1)
+            await asyncio.sleep(0)
+            self.assertEqual(july[1].qsize(), 1)
+
+            for shop_id, month, entry in ((1, 6, june), (1, 7, july), (2, 6, other)):
+                broadcaster.unsubscribe(shop_id, 2025, month, entry)
+            self.assertEqual(broadcaster.subscribers_count(), 0)
+
+        asyncio.run(scenario())
+
+
+class ShopRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+
+    def test_lookups_hit_database_once(self):
+        self.assertEqual(shops.get_by_slug(self.shop.slug).id, self.shop.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(shops.get_by_code('CEN').id, self.shop.id)
+            self.assertEqual(shops.get_by_id(str(self.shop.id)).slug, self.shop.slug)
+            self.assertIsNone(shops.get_by_code('XXX'))
+            self.assertEqual([s.id for s in shops.all()], [self.shop.id])
+
+    def test_save_invalidates_after_commit(self):
+        shops.all()
+        with self.captureOnCommitCallbacks(execute=True):
+            CoffeeShop.objects.create(name='Парк', short_code='PAR')
+        self.assertEqual(shops.get_by_code('PAR').name, 'Парк')
+
+    def test_invalidation_reaches_other_registries_through_the_cache(self):
+        other_process = ShopRegistry()
+        self.assertEqual(other_process.get_by_code('CEN').name, 'Центр')
+        with self.captureOnCommitCallbacks(execute=True):
+            CoffeeShop.objects.filter(id=self.shop.id).update(name='Новый')
+            self.shop.refresh_from_db()
+            self.shop.save()
+        self.assertEqual(other_process.get_by_code('CEN').name, 'Новый')
+
+        CoffeeShop.objects.filter(id=self.shop.id).update(name='Старый')
+        cache.delete(VERSION_KEY)
+        self.assertEqual(other_process.get_by_code('CEN').name, 'Старый')
+
+    def test_returned_shops_are_copies(self):
+        shops.get_by_slug(self.shop.slug).pending_applications_count = 5
+        self.assertFalse(hasattr(shops.get_by_slug(self.shop.slug), 'pending_applications_count'))
+
+
+class PendingCountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pass'))
+
+    def add_shops(self, count):
+        for _ in range(count):
+            shop = CoffeeShop.objects.create(name=f'shop{CoffeeShop.objects.count()}', short_code=f'S{CoffeeShop.objects.count()}')
+            worker = Worker.objects.create(name='w', phone_number='+79000000000', coffee_shop=shop)
+            shift = Shift.objects.create(worker=worker, coffee_shop=shop, date=date(2025, 1, 1))
+            ShiftRequest.objects.create(shift=shift, worker=worker, reason='')
+            ShiftRequest.objects.create(shift=shift, worker=worker, reason='', status='REJECTED')
+        cache.clear()
+
+    def index_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('main:index'))
+        self.assertTrue(all(c.pending_applications_count == 1 for c in response.context['cafes']))
+        return len(ctx.captured_queries)
+
+    def test_index_cost_does_not_depend_on_shop_count(self):
+        self.add_shops(5)
+        few = self.index_queries()
+        self.add_shops(45)
+        self.assertEqual(few, self.index_queries())
+
+
+class RequestIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR')
+        self.user = User.objects.create_user('admin', password='pass')
+        UserProfile.objects.create(user=self.user, role='SHOP_ADMIN')
+        ShopAdmin.objects.create(user=self.user, coffee_shop=self.shop)
+        self.client.force_login(self.user)
+
+    def identity_tables_queried(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        return response, [t for t in ('shop_admins', 'user_profiles', 'workers') if f'"{t}"' in sql]
+
+    def test_repeat_requests_reuse_session_identity(self):
+        url = reverse('main:schedule', args=[self.shop.slug, 2025, 1])
+        response, tables = self.identity_tables_queried(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('shop_admins', tables)
+
+        response, tables = self.identity_tables_queried(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('shop_admins', tables)
+        self.assertNotIn('user_profiles', tables)
+        self.assertEqual(response.context['user_role'], 'SHOP_ADMIN')
+
+    def test_assignment_change_invalidates_identity(self):
+        url = reverse('main:schedule', args=[self.other.slug, 2025, 1])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShopAdmin.objects.create(user=self.user, coffee_shop=self.other)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class LoginRequiredMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.middleware = LoginRequiredMiddleware(lambda request: HttpResponse('ok'))
+
+    def test_static_and_media_skip_user_lookup(self):
+        for path in ('/static/css/base.css', '/media/workers/photos/a.jpg'):
+            request = RequestFactory().get(path)
+            self.assertFalse(hasattr(request, 'user'))
+            with self.assertNumQueries(0):
+                self.assertEqual(self.middleware(request).status_code, 200)
+
+    def test_worker_without_shop_is_sent_to_index(self):
+        user = User.objects.create_user('new', password='pass')
+        Worker.objects.create(name='new', phone_number='+79000000000', user=user)
+        self.client.force_login(user)
+        self.assertRedirects(self.client.get(reverse('main:statistics')), reverse('main:index'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('main:index')).status_code, 200)
+
+
+class PayrollReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', hourly_rate=2400)
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR', hourly_rate=3000)
+        self.senior = Worker.objects.create(
+            name='senior', phone_number='+79000000000', coffee_shop=self.shop,
+            start_date_experience_years=date(2024, 1, 1), experience_years=1.0,
+        )
+        self.junior = Worker.objects.create(name='junior', phone_number='+79000000000', coffee_shop=self.other)
+
+    def test_totals_breakdown_and_query_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, 5):
+                Shift.objects.create(worker=self.senior, coffee_shop=self.shop, date=date(2025, 3, day), is_plus=(day == 1))
+            Shift.objects.create(worker=self.senior, coffee_shop=self.shop, another_shop=self.other, date=date(2025, 3, 5))
+            Shift.objects.create(worker=self.senior, coffee_shop=self.shop, date=date(2025, 3, 6), display_text='отпуск')
+            Shift.objects.create(worker=self.junior, coffee_shop=self.other, date=date(2025, 3, 1))
+            Shift.objects.create(worker=self.junior, coffee_shop=self.other, date=date(2025, 4, 1))
+
+        shops.all()
+        with self.assertNumQueries(3):
+            report = PayrollReport.build(date(2025, 3, 1), date(2025, 3, 31))
+
+        (shop, senior), (other, junior) = report.rows()
+        self.assertEqual((shop, other), (self.shop, self.other))
+        # 455 дней стажа к 31.03.2025 -> два полугодия, +200 к каждой смене
+        self.assertEqual(senior['shifts_count'], 5)
+        self.assertEqual(senior['plus_shifts_count'], 1)
+        self.assertEqual(senior['breakdown'], '4 CEN + 1 PAR + (+)')
+        self.assertEqual(senior['rate'], 2600)
+        self.assertEqual(senior['total_salary'], 4 * 2600 + 3200 + 500)
+        self.assertEqual(junior['total_salary'], 3000)
+        self.assertEqual(report.total_salary, 4 * 2600 + 3200 + 500 + 3000)
+
+
+class PayrollLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', hourly_rate=2400)
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR', hourly_rate=3000)
+        self.worker = Worker.objects.create(
+            name='w', phone_number='+79000000000', coffee_shop=self.shop,
+            start_date_experience_years=date(2024, 9, 1),
+        )
+
+    def amounts(self):
+        return dict(PayrollEntry.objects.values_list('date', 'amount'))
+
+    def test_entries_follow_shift_and_rate_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shift = Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 2, 27))
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 3, 1), is_plus=True)
+        # стаж считается на дату смены: полугодие исполняется 28.02.2025
+        self.assertEqual(self.amounts(), {date(2025, 2, 27): 2400, date(2025, 3, 1): 2400 + 100 + 500})
+
+        shift.another_shop = self.other
+        with self.captureOnCommitCallbacks(execute=True):
+            shift.save()
+        self.assertEqual(self.amounts()[date(2025, 2, 27)], 3000)
+
+        shift.display_text = 'отпуск'
+        with self.captureOnCommitCallbacks(execute=True):
+            shift.save()
+        self.assertNotIn(date(2025, 2, 27), self.amounts())
+
+        self.shop.hourly_rate = 2500
+        self.shop.save()
+        self.assertEqual(self.amounts(), {date(2025, 3, 1): 2500 + 100 + 500})
+
+        self.worker.start_date_experience_years = date(2024, 3, 1)
+        self.worker.save()
+        self.assertEqual(self.amounts(), {date(2025, 3, 1): 2500 + 200 + 500})
+
+    def test_cells_are_synced_once_per_transaction(self):
+        with mock.patch.object(ledger, 'sync_cells', wraps=ledger.sync_cells) as sync_cells:
+            with self.captureOnCommitCallbacks(execute=True):
+                for day in range(1, 4):
+                    Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 3, day))
+                Shift.objects.filter(date=date(2025, 3, 3)).delete()
+        sync_cells.assert_called_once()
+        self.assertEqual(set(self.amounts()), {date(2025, 3, 1), date(2025, 3, 2)})
+
+    def test_rebuild_matches_incremental_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, 6):
+                Shift.objects.create(worker=self.worker, coffee_shop=self.shop, another_shop=self.other if day == 3 else None, date=date(2025, 3, day))
+        before = self.amounts()
+        PayrollEntry.objects.all().delete()
+        self.assertEqual(ledger.rebuild(date(2025, 3, 1), date(2025, 3, 31)), 5)
+        self.assertEqual(self.amounts(), before)
+
+        Worker.objects.create(name='other', phone_number='+79000000001', coffee_shop=self.other)
+        with mock.patch.object(ledger, 'make_entry', wraps=ledger.make_entry) as make_entry:
+            with CaptureQueriesContext(connection) as ctx:
+                ledger.rebuild(worker_ids=[self.worker.id])
+        worker_query = next(q['sql'] for q in ctx.captured_queries if 'start_date_experience_years' in q['sql'])
+        self.assertIn(' IN (', worker_query)
+        self.assertEqual(make_entry.call_count, 5)
+
+    def test_rates_follow_history(self):
+        ShopRate.objects.filter(coffee_shop=self.shop).update(effective_from=date(2024, 1, 1))
+        ShopRate.objects.create(coffee_shop=self.shop, hourly_rate=2600, effective_from=date(2025, 3, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in (date(2025, 2, 20), date(2025, 3, 1), date(2025, 4, 1)):
+                Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=day)
+        self.assertEqual(list(PayrollEntry.objects.order_by('date').values_list('base_rate', flat=True)), [2400, 2600, 2600])
+
+        ShopRate.objects.create(coffee_shop=self.shop, hourly_rate=2800, effective_from=date(2025, 4, 1))
+        self.assertEqual(list(PayrollEntry.objects.order_by('date').values_list('base_rate', flat=True)), [2400, 2600, 2800])
+
+        report = PayrollReport.build(date(2025, 2, 1), date(2025, 3, 31))
+        (entry,) = report.stats
+        self.assertEqual(entry['rate'], 2600)
+        self.assertEqual(entry['workers'][0]['total_salary'], 2400 + 2600 + 100)
+
+    def test_admin_rate_change_with_inline_row_for_today(self):
+        rate = ShopRate.objects.get(coffee_shop=self.shop)
+        ShopRate.objects.filter(id=rate.id).update(effective_from=date(2024, 1, 1))
+        admin_user = User.objects.create_superuser('root', password='pass')
+        self.client.force_login(admin_user)
+        today = timezone.localdate()
+        response = self.client.post(reverse('admin:main_coffeeshop_change', args=[self.shop.id]), {
+            'name': self.shop.name, 'slug': self.shop.slug, 'short_code': self.shop.short_code,
+            'minimum_workers': 4, 'hourly_rate': 2600,
+            'rates-TOTAL_FORMS': 2, 'rates-INITIAL_FORMS': 1, 'rates-MIN_NUM_FORMS': 0, 'rates-MAX_NUM_FORMS': 1000,
+            'rates-0-id': rate.id, 'rates-0-coffee_shop': self.shop.id,
+            'rates-0-hourly_rate': 2400, 'rates-0-effective_from': '2024-01-01',
+            'rates-1-coffee_shop': self.shop.id, 'rates-1-hourly_rate': 2700, 'rates-1-effective_from': today.isoformat(),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(ShopRate.objects.filter(coffee_shop=self.shop).values_list('effective_from', 'hourly_rate')),
+            [(date(2024, 1, 1), 2400), (today, 2700)],
+        )
+
+    def test_guest_shift_falls_back_to_home_shop_when_shop_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, another_shop=self.other, date=date(2025, 3, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertEqual(list(PayrollEntry.objects.values_list('shop_id', 'amount')), [(self.shop.id, 2400 + 100)])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', hourly_rate=2400)
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR', hourly_rate=3000)
+        self.worker = Worker.objects.create(name='Анна', phone_number='+79000000000', coffee_shop=self.shop)
+        self.guest = Worker.objects.create(name='Борис', phone_number='+79000000000', coffee_shop=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 1, 31), start_time=time(8, 0), is_plus=True)
+            Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=date(2025, 2, 1), display_text='отпуск')
+            Shift.objects.create(worker=self.guest, coffee_shop=self.other, another_shop=self.shop, date=date(2025, 2, 2))
+
+        self.user = User.objects.create_user('admin', password='pass')
+        UserProfile.objects.create(user=self.user, role='SHOP_ADMIN')
+        ShopAdmin.objects.create(user=self.user, coffee_shop=self.shop)
+        self.client.force_login(self.user)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), {'from': '2025-01-15', 'to': '2025-02-15', **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_schedule_csv_covers_range_and_guests(self):
+        content = self.get('main:export_schedule', shop=self.shop.slug).decode('utf-8-sig')
+        self.assertEqual(list(csv.reader(io.StringIO(content))), [
+            ['Кофейня', 'Работник', 'Дата', 'Смена', 'Заявка на обмен'],
+            ['Центр', 'Анна', '2025-01-31', '08:00+', ''],
+            ['Центр', 'Анна', '2025-02-01', 'отпуск', ''],
+            ['Центр', 'Борис', '2025-02-02', 'CEN', ''],
+        ])
+
+    def test_payroll_xlsx_is_a_valid_workbook(self):
+        content = self.get('main:export_payroll', format='xlsx')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('Анна', sheet)
+        self.assertIn('<v>2900</v>', sheet)
+        self.assertNotIn('Борис', sheet)
+
+    def test_shop_admin_cannot_export_other_shop(self):
+        response = self.client.get(reverse('main:export_payroll'), {'from': '2025-01-01', 'to': '2025-01-31', 'shop': self.other.slug})
+        self.assertEqual(response.status_code, 403)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_builds_a_consistent_dataset(self):
+        data = generate(shops=2, workers=3, months=1, today=date(2025, 2, 10))
+        self.assertEqual(len(data['workers']), 6)
+        self.assertEqual((data['date_from'], data['date_to']), (date(2025, 2, 1), date(2025, 2, 28)))
+        self.assertEqual(Shift.objects.count(), data['shifts'])
+        self.assertEqual(PayrollEntry.objects.count(), Shift.objects.filter(display_text='').count())
+        self.assertEqual(ShopAdmin.objects.filter(user__in=data['shop_admins']).count(), 2)
+        self.assertTrue(Worker.objects.get(id=data['workers'][0].id).phone_number.startswith('+79'))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT phone_number FROM {Worker._meta.db_table} LIMIT 1')
+            self.assertFalse(cursor.fetchone()[0].startswith('+'))
+        self.assertTrue(all(s.another_shop_id != s.coffee_shop_id for s in Shift.objects.exclude(another_shop=None)))
+
+    def test_generate_leaves_existing_workers_alone(self):
+        shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+        worker = Worker.objects.create(
+            name='w', phone_number='+79000000000', coffee_shop=shop,
+            start_date_experience_years=timezone.localdate() - timedelta(days=400),
+        )
+        Worker.objects.filter(id=worker.id).update(experience_years=0)
+        data = generate(shops=1, workers=2, months=1)
+        self.assertEqual(Worker.objects.get(id=worker.id).experience_years, 0)
+        self.assertTrue(all(
+            w.experience_years == w.compute_experience_years() for w in Worker.objects.filter(id__in=[w.id for w in data['workers']])
+        ))
+
+class ExperienceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN')
+        self.worker = Worker.objects.create(
+            name='w', phone_number='+79000000000', coffee_shop=self.shop,
+            start_date_experience_years=timezone.localdate() - timedelta(days=400),
+        )
+        user = User.objects.create_user('admin', password='pass')
+        UserProfile.objects.create(user=user, role='SUPER_ADMIN')
+        self.client.force_login(user)
+
+    def test_read_paths_do_not_write(self):
+        today = timezone.localdate()
+        urls = [
+            reverse('main:workers', args=[self.shop.slug]),
+            reverse('main:worker_detail', args=[self.worker.id]),
+            reverse('main:schedule', args=[self.shop.slug, today.year, today.month]),
+        ]
+        self.client.get(urls[0])
+        for url in urls:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            writes = [q['sql'] for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith(('UPDATE', 'INSERT'))]
+            self.assertEqual([w for w in writes if 'workers' in w], [])
+        self.assertContains(self.client.get(urls[1]), 'Стаж (лет):</b> 1,0')
+
+    def test_nightly_persist_updates_changed_workers_only(self):
+        Worker.objects.create(name='new', phone_number='+79000000000', coffee_shop=self.shop)
+        self.assertEqual(Worker.persist_experience_years(), 1)
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.experience_years, 1.0)
+        self.assertEqual(Worker.persist_experience_years(), 0)
+
+
+class UnderstaffingCheckTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', minimum_workers=1)
+        self.other = CoffeeShop.objects.create(name='Парк', short_code='PAR', minimum_workers=1)
+        self.worker = Worker.objects.create(name='w', phone_number='+79000000000', coffee_shop=self.other)
+        for offset in range(5):
+            Shift.objects.create(worker=self.worker, coffee_shop=self.other, date=self.today + timedelta(days=offset))
+
+    @mock.patch('main.utils.send_push_to_admin')
+    def test_scan_is_one_grouped_query_and_alerts_once(self, send):
+        Shift.objects.filter(date=self.today + timedelta(days=1)).update(another_shop=self.shop)
+        shops.all()
+        with self.assertNumQueries(2):
+            gaps, fresh = check_and_notify_understaffing(horizon=5, dry_run=True)
+        self.assertEqual(
+            sorted((shop.short_code, day['date']) for shop, day in gaps),
+            [('CEN', self.today + timedelta(days=i)) for i in (0, 2, 3, 4)] + [('PAR', self.today + timedelta(days=1))],
+        )
+        self.assertEqual(len(fresh), 5)
+        send.assert_not_called()
+
+        check_and_notify_understaffing(horizon=5)
+        self.assertEqual(send.call_count, 2)
+        self.assertIn('(0 из 1)', send.call_args_list[0].args[1])
+
+        send.reset_mock()
+        _, fresh = check_and_notify_understaffing(horizon=5)
+        self.assertEqual(fresh, [])
+        send.assert_not_called()
+
+        Shift.objects.filter(date=self.today + timedelta(days=1)).update(another_shop=None)
+        _, fresh = check_and_notify_understaffing(horizon=5)
+        self.assertEqual([(shop, day['date']) for shop, day in fresh], [(self.shop, self.today + timedelta(days=1))])
+        self.assertFalse(StaffingAlert.objects.filter(coffee_shop=self.other).exists())
+
+
+class PushOutsideTransactionTests(TransactionTestCase):
+    def test_topic_enqueue_locks_rows_inside_its_own_transaction(self):
+        shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', minimum_workers=1)
+        user = User.objects.create_superuser('root', password='pass')
+        PushSubscriptions.objects.create(user=user, endpoint='https://push.example/1', auth='a', p256dh='p')
+        with mock.patch.object(connection.features, 'has_select_for_update', True), \
+                mock.patch.object(connection.ops, 'for_update_sql', return_value=''):
+            notify_understaffed(shop, [{'date': timezone.localdate(), 'workers_count': 0, 'minimum_workers': 1}])
+            notify_understaffed(shop, [{'date': timezone.localdate(), 'workers_count': 0, 'minimum_workers': 1}])
+        self.assertEqual(PushMessage.objects.get().topic, f'staffing:{shop.id}')
+
+class CoverageAlertTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.localdate() + timedelta(days=3)
+        self.shop = CoffeeShop.objects.create(name='Центр', short_code='CEN', minimum_workers=1)
+        self.worker = Worker.objects.create(name='w', phone_number='+79000000000', coffee_shop=self.shop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shift = Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=self.day)
+
+    def alerts(self):
+        return list(StaffingAlert.objects.values_list('date', 'workers_count', 'pending'))
+
+    @mock.patch('main.utils.send_push_to_admin')
+    def test_only_crossings_are_tracked_and_debounced(self, send):
+        self.assertEqual(self.alerts(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shift.display_text = 'больничный'
+            self.shift.save()
+        self.assertEqual(self.alerts(), [(self.day, 0, True)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shift.display_text = ''
+            self.shift.save()
+        self.assertEqual(self.alerts(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shift.delete()
+        self.assertEqual(coverage_alerts.flush_pending(), 0)
+        send.assert_not_called()
+
+        self.assertEqual(coverage_alerts.flush_pending(timezone.now() + timedelta(minutes=5)), 1)
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(self.alerts(), [(self.day, 0, False)])
+        self.assertEqual(coverage_alerts.flush_pending(timezone.now() + timedelta(minutes=5)), 0)
+
+    def test_cells_are_reconciled_once_per_transaction(self):
+        next_day = self.day + timedelta(days=1)
+        with mock.patch.object(coverage_alerts, 'reconcile', wraps=coverage_alerts.reconcile) as reconcile:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.shift.display_text = 'больничный'
+                self.shift.save()
+                Shift.objects.create(worker=self.worker, coffee_shop=self.shop, date=next_day, display_text='отпуск')
+        reconcile.assert_called_once()
+        self.assertEqual(sorted(self.alerts()), [(self.day, 0, True), (next_day, 0, True)])
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_process_local_cache_is_an_error_outside_debug(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with self.settings(DEBUG=False, TESTING=False, CACHES=locmem):
+            self.assertEqual([e.id for e in shared_cache_check(None)], ['main.E001'])
+        with self.settings(DEBUG=False, TESTING=True, CACHES=locmem):
+            self.assertEqual(shared_cache_check(None), [])
+        with self.settings(DEBUG=True, CACHES=locmem):
+            self.assertEqual(shared_cache_check(None), [])
+        with self.settings(DEBUG=False, TESTING=False, CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'}}):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+class ManualScheduler(BaseScheduler):
+    def shutdown(self, wait=True):
+        super().shutdown(wait)
+
+    def wakeup(self):
+        pass
+
+
+class SchedulerTests(TestCase):
+    def make_scheduler(self):
+        scheduler = job_scheduler.build_scheduler(ManualScheduler)
+        scheduler.start(paused=True)
+        self.addCleanup(lambda: scheduler.running and scheduler.shutdown())
+        job_scheduler.sync_jobs(scheduler)
+        return scheduler
+
+    def test_lease_is_exclusive_until_it_expires(self):
+        self.assertTrue(job_scheduler.acquire_lease('a', 60))
+        self.assertFalse(job_scheduler.acquire_lease('b', 60))
+        self.assertTrue(job_scheduler.acquire_lease('a', 60))
+        job_scheduler.release_lease('a')
+        self.assertTrue(job_scheduler.acquire_lease('b', -1))
+        self.assertTrue(job_scheduler.acquire_lease('a', 60))
+
+    def test_jobs_persist_and_keep_missed_run_times(self):
+        scheduler = self.make_scheduler()
+        self.assertEqual(set(SchedulerJob.objects.values_list('id', flat=True)), set(job_scheduler.JOBS))
+
+        missed = timezone.now() - timedelta(hours=1)
+        job = scheduler.get_job('check_staffing_job')
+        job.modify(next_run_time=missed)
+        scheduler.shutdown()
+
+        scheduler = self.make_scheduler()
+        job = scheduler.get_job('check_staffing_job')
+        self.assertEqual(job.next_run_time, missed)
+        self.assertTrue(job.coalesce)
+        self.assertGreater(job.misfire_grace_time, 3600)
+        self.assertIn(job, scheduler._lookup_jobstore('default').get_due_jobs(timezone.now()))
+
+    @mock.patch('main.utils.send_push_to_admin')
+    def test_run_job_records_metrics(self, send):
+        self.make_scheduler()
+        job_scheduler.run_job('flush_staffing_alerts_job')
+        with mock.patch('main.coverage_alerts.flush_pending', side_effect=RuntimeError('boom')):
+            job_scheduler.run_job('flush_staffing_alerts_job')
+        job = SchedulerJob.objects.get(id='flush_staffing_alerts_job')
+        self.assertEqual((job.run_count, job.failure_count, job.last_status), (2, 1, 'error'))
+        self.assertIn('boom', job.last_error)
+        self.assertIsNotNone(job.last_duration)
+
+    @mock.patch('main.coverage_alerts.flush_pending')
+    def test_jobs_are_fenced_by_the_lease(self, flush):
+        scheduler = job_scheduler.build_scheduler(ManualScheduler)
+        scheduler.start(paused=True)
+        self.addCleanup(lambda: scheduler.running and scheduler.shutdown())
+        job_scheduler.sync_jobs(scheduler, 'a')
+        job = scheduler.get_job('flush_staffing_alerts_job')
+        self.assertEqual(job.args, ('flush_staffing_alerts_job', 'a'))
+
+        job_scheduler.acquire_lease('a', -1)
+        job_scheduler.acquire_lease('b', 60)
+        job.func(*job.args)
+        flush.assert_not_called()
+
+        job_scheduler.sync_jobs(scheduler, 'b')
+        job = scheduler.get_job('flush_staffing_alerts_job')
+        job.func(*job.args)
+        flush.assert_called_once()
+
+
+class PushOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('u', password='pass')
+        self.first = PushSubscriptions.objects.create(user=self.user, endpoint='https://push.example/1', auth='a', p256dh='p')
+        self.second = PushSubscriptions.objects.create(user=self.user, endpoint='https://push.example/2', auth='a', p256dh='p')
+
+    def drain(self, send):
+        sender = mock.Mock(send=mock.Mock(side_effect=send))
+        push.PushDeliveryService(pool=mock.Mock(map=map), sender=sender).drain_once()
+        return sender.send
+
+    def test_enqueue_is_part_of_the_transaction(self):
+        try:
+            with transaction.atomic():
+                send_push_notification(self.user, 't', 'b', '/')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(PushMessage.objects.exists())
+        send_push_notification(self.user, 't', 'b', '/')
+        self.assertEqual(PushMessage.objects.count(), 2)
+
+    def test_failures_back_off_and_keep_per_endpoint_order(self):
+        for n in range(2):
+            send_push_notification(self.user, f't{n}', 'b', '/')
+
+        def fail_first(subscription, payload):
+            if subscription.id == self.first.id and '"t0"' in payload:
+                raise WebPushException('boom', response=mock.Mock(status_code=500))
+
+        self.assertEqual(self.drain(fail_first).call_count, 3)
+        self.assertEqual(
+            list(PushMessage.objects.values_list('subscription_id', 'attempts', 'payload')),
+            [(self.first.id, 1, json.dumps({'title': 't0', 'body': 'b', 'url': '/'})),
+             (self.first.id, 0, json.dumps({'title': 't1', 'body': 'b', 'url': '/'}))],
+        )
+        self.assertEqual(self.drain(None).call_count, 0)
+
+        PushMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(self.drain(None).call_count, 0)
+        PushSubscriptions.objects.update(retry_after=None)
+        send = self.drain(None)
+        self.assertEqual([json.loads(c.args[1])['title'] for c in send.call_args_list], ['t0', 't1'])
+        self.assertFalse(PushMessage.objects.exists())
+
+    def test_topic_messages_coalesce_into_one_digest(self):
+        other = User.objects.create_user('o', password='pass')
+        PushSubscriptions.objects.create(user=other, endpoint='https://push.example/3', auth='a', p256dh='p')
+        for n in range(7):
+            push.enqueue([self.user, other, self.user], 'Смена', f'b{n}', f'/{n}', topic='applications:1')
+        push.enqueue([self.user], 'Смена', 'b6', '/6', topic='applications:1')
+        push.enqueue([self.user], 'Регистрация', 'r', '/r', topic='registrations')
+
+        digests = PushMessage.objects.filter(topic='applications:1')
+        self.assertEqual(digests.count(), 3)
+        self.assertEqual(len(digests[0].items), 7)
+        self.assertEqual(self.drain(None).call_count, 0)
+
+        PushMessage.objects.update(available_at=timezone.now())
+        payloads = [json.loads(c.args[1]) for c in self.drain(None).call_args_list]
+        self.assertEqual(len(payloads), 5)
+        self.assertEqual(payloads[0], {
+            'title': 'Смена (7)', 'body': 'b2\nb3\nb4\nb5\nb6\n…и ещё 2', 'url': '/6',
+        })
+        self.assertEqual(payloads[1], {'title': 'Регистрация', 'body': 'r', 'url': '/r'})
+
+    def test_failing_endpoint_backs_off_and_is_pruned(self):
+        send_push_notification(self.user, 't', 'b', '/')
+
+        def time_out_first(subscription, payload):
+            if subscription.id == self.first.id:
+                raise requests.Timeout()
+
+        self.drain(time_out_first)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.failure_count, self.second.failure_count), (1, 0))
+        self.assertGreater(self.first.retry_after, timezone.now())
+        self.assertIsNotNone(self.second.last_success_at)
+
+        PushMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(self.drain(None).call_count, 0)
+
+        PushSubscriptions.objects.filter(id=self.first.id).update(failure_count=settings.PUSH_SUBSCRIPTION_MAX_FAILURES)
+        send_push_notification(self.user, 't', 'b', '/')
+        self.assertEqual(list(PushMessage.objects.values_list('subscription_id', flat=True)), [self.first.id, self.second.id])
+        self.assertEqual(push.prune_subscriptions(dry_run=True), 1)
+        call_command('prune_push_subscriptions', stdout=io.StringIO())
+        self.assertEqual(list(PushSubscriptions.objects.values_list('id', flat=True)), [self.second.id])
+        self.assertEqual(PushMessage.objects.count(), 1)
+
+    def test_stand_in_service_decrypts_and_simulates_gone(self):
+        service = StandInPushService().start()
+        self.addCleanup(service.stop)
+        info = service.subscribe()
+        subscription = PushSubscriptions.objects.create(
+            user=self.user, endpoint=info['endpoint'], auth=info['keys']['auth'], p256dh=info['keys']['p256dh'],
+        )
+        vapid = Vapid()
+        vapid.generate_keys()
+        sender = push.PushSender(vapid_key=vapid, admin_email='a@b.c')
+        self.addCleanup(sender.close)
+
+        sender.send(subscription, json.dumps({'title': 't'}))
+        self.assertEqual([message for _, _, message in service.received], [{'title': 't'}])
+
+        service.gone_rate = 1
+        PushMessage.objects.create(subscription=subscription, items=[], payload='{}')
+        push.deliver_batch(sender, list(PushMessage.objects.filter(subscription=subscription)))
+        self.assertFalse(PushSubscriptions.objects.filter(id=subscription.id).exists())
+        self.assertEqual(service.stats, {201: 1, 410: 1})
+
+    def test_partial_batch_failure_keeps_the_endpoint_backed_off(self):
+        for n in range(2):
+            send_push_notification(self.user, f't{n}', 'b', '/')
+
+        def fail_second(subscription, payload):
+            if '"t1"' in payload:
+                raise requests.Timeout()
+
+        self.drain(fail_second)
+        self.assertEqual(
+            sorted(PushSubscriptions.objects.values_list('failure_count', flat=True)), [1, 1],
+        )
+        self.assertFalse(PushSubscriptions.objects.filter(retry_after=None).exists())
+
+    def test_prune_purges_old_failed_messages(self):
+        for n in range(2):
+            send_push_notification(self.user, f't{n}', 'b', '/')
+        old = timezone.now() - timedelta(days=settings.PUSH_FAILED_RETENTION_DAYS + 1)
+        PushMessage.objects.filter(subscription=self.first).update(status='FAILED', created_at=old)
+        PushMessage.objects.filter(subscription=self.second, payload__contains='t0').update(status='FAILED')
+        self.assertEqual(push.prune(), (0, 2))
+        self.assertEqual(PushMessage.objects.filter(status='FAILED').count(), 1)
+
+    def test_waiting_digests_do_not_use_up_the_claim_limit(self):
+        other = User.objects.create_user('o', password='pass')
+        PushSubscriptions.objects.create(user=other, endpoint='https://push.example/3', auth='a', p256dh='p')
+        for n in range(3):
+            push.enqueue([self.user], 't', f'b{n}', '/', topic=f'digest:{n}')
+        send_push_notification(other, 't', 'b', '/')
+        self.assertEqual([len(b) for b in push.claim_batches(limit=1)], [1])
+
+    def test_claimed_messages_are_not_claimed_again(self):
+        for n in range(2):
+            send_push_notification(self.user, f't{n}', 'b', '/')
+        claimed = push.claim_batches(owner='a')
+        self.assertEqual(sum(len(b) for b in claimed), 4)
+        self.assertEqual(push.claim_batches(owner='b'), [])
+
+        later = timezone.now() + timedelta(seconds=settings.PUSH_CLAIM_TIMEOUT + 1)
+        self.assertEqual(sum(len(b) for b in push.claim_batches(later, owner='b')), 4)
+
+    def test_unsent_messages_are_released_after_endpoint_failure(self):
+        for n in range(2):
+            send_push_notification(self.user, f't{n}', 'b', '/')
+        batch = push.claim_batches(owner='a')[0]
+        sender = mock.Mock(send=mock.Mock(side_effect=requests.Timeout()))
+        push.deliver_batch(sender, batch)
+        self.assertFalse(PushMessage.objects.filter(subscription=batch[0].subscription).exclude(claimed_at=None).exists())
+
+    def test_gone_subscription_is_removed(self):
+        send_push_notification(self.user, 't', 'b', '/')
+        self.drain(WebPushException('gone', response=mock.Mock(status_code=410)))
+        self.assertFalse(PushSubscriptions.objects.exists())
+        self.assertFalse(PushMessage.objects.exists())
+
+    def test_sender_reuses_sessions_and_vapid_headers_per_origin(self):
+        vapid = Vapid()
+        vapid.generate_keys()
+        sender = push.PushSender(vapid_key=vapid, admin_email='a@b.c')
+        with mock.patch.object(vapid, 'sign', wraps=vapid.sign) as sign:
+            first = sender.vapid_headers('https://fcm.googleapis.com')
+            self.assertIs(sender.vapid_headers('https://fcm.googleapis.com'), first)
+            sender.vapid_headers('https://updates.push.services.mozilla.com')
+            self.assertEqual(sign.call_count, 2)
+            with mock.patch('main.push.time.time', return_value=time_module.time() + push.VAPID_TTL):
+                sender.vapid_headers('https://fcm.googleapis.com')
+            self.assertEqual(sign.call_count, 3)
+        self.assertIs(sender.session('https://fcm.googleapis.com'), sender.session('https://fcm.googleapis.com'))
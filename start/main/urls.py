@@ -8,8 +8,12 @@ urlpatterns = [
     path('shops/<slug:slug>/', views.get_workers, name='workers'),
     path('workers/<int:worker_id>/', views.worker_detail, name='worker_detail'),
     path('schedule/<slug:slug>/<int:year>/<int:month>/', views.schedule_view, name='schedule'),
+    path('api/schedule/<slug:slug>/<int:year>/<int:month>/', views.schedule_data, name='schedule_data'),
+    path('api/schedule/<slug:slug>/<int:year>/<int:month>/stream/', views.schedule_stream, name='schedule_stream'),
     path('api/schedule/update/', views.update_shift, name='update_shift'),
+    path('api/schedule/bulk-update/', views.bulk_update_shifts, name='bulk_update_shifts'),
     path('shift/offer/', views.offer_shift_exchange, name='offer_shift_exchange'),
+    path('api/shift/<int:shift_id>/candidates/', views.shift_candidates, name='shift_candidates'),
     path('applications/confirm/', views.confirm_take_shift, name='confirm_take_shift'),
     path('applications/accept/', views.accept_application, name='accept_application'),
     path('applications/reject/', views.reject_application, name='reject_application'),
@@ -19,6 +23,8 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.log_out, name='logout'),
     path('statistics/', views.statistics, name='statistics'),
+    path('export/schedule/', views.export_schedule, name='export_schedule'),
+    path('export/payroll/', views.export_payroll, name='export_payroll'),
     path('register/', views.register_view, name='register'),
     path('save-subscription/', views.save_push_subscription, name='save_push_subscription'),
     path('managment/pending/', views.pending_registrations, name='pending_registrations'),
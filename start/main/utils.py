@@ -1,74 +1,71 @@
-import json
-from pywebpush import webpush, WebPushException
 from django.conf import settings
 from django.db.models import Q
 from django.contrib.auth.models import User
-from .models import PushSubscriptions
+from .push import enqueue
 
-def send_push_notification(user, title, body, url):
-    subscriptions = PushSubscriptions.objects.filter(user=user)
-    
-    payload = json.dumps({
-        "title": title,
-        "body": body,
-        "url": url
-    })
+def send_push_notification(user, title, body, url, topic=''):
+    enqueue([user], title, body, url, topic)
 
-    for sub in subscriptions:
-        try:
-            from urllib.parse import urlparse
-            parsed_uri = urlparse(sub.endpoint)
-            audience = f"{parsed_uri.scheme}://{parsed_uri.netloc}"
-
-            webpush(
-                subscription_info={
-                    "endpoint": sub.endpoint,
-                    "keys": {"auth": sub.auth, "p256dh": sub.p256dh}
-                },
-                data=payload,
-                vapid_private_key=settings.WEBPUSH_VAPID_PRIVATE_KEY,
-                vapid_claims={
-                    "sub": f"mailto:{settings.WEBPUSH_ADMIN_EMAIL}",
-                    "aud": audience
-                },
-                ttl=3600
-            )
-        except WebPushException as ex:
-            if ex.response and ex.response.status_code == 410:
-                sub.delete()
-
-def send_push_to_admin(title, body, url, coffee_shop=None):
+def send_push_to_admin(title, body, url, coffee_shop=None, topic='', with_super_admins=False):
+    super_admins = Q(is_superuser=True) | Q(profile__role='SUPER_ADMIN')
     if coffee_shop:
-        admins = User.objects.filter(
-            admin_shops__coffee_shop=coffee_shop
-        ).distinct()
+        admins = Q(admin_shops__coffee_shop=coffee_shop)
+        if with_super_admins:
+            admins |= super_admins
     else:
-        admins = User.objects.filter(
-            Q(is_superuser=True) | Q(profile__role='SUPER_ADMIN')
-        ).distinct()
-    
-    for admin in admins:
-        send_push_notification(admin, title, body, url)
+        admins = super_admins
+    enqueue(User.objects.filter(admins).values('id'), title, body, url, topic)
 
-def check_and_notify_understaffing():
-    from .models import CoffeeShop, Shift
+def check_and_notify_understaffing(horizon=None, dry_run=False):
+    from .coverage import understaffed_days
+    from .models import StaffingAlert
+    from .shop_registry import shops as shop_registry
+    from django.db import transaction
     from django.utils import timezone
     from datetime import timedelta
-    
-    target_date = timezone.localdate() + timedelta(days=2)
-    shops = CoffeeShop.objects.all()
-    
-    for shop in shops:
-        shifts_count = Shift.objects.filter(
-            Q(coffee_shop=shop) | Q(another_shop=shop),
-            date=target_date
-        ).count()
-        
-        if shifts_count < shop.minimum_workers:
-            title = "Нехватка персонала"
-            body = f"На {shop.name}, {target_date.strftime('%d.%m')}, нехватает людей (в графике {shifts_count} из {shop.minimum_workers})."
-            url = f"{settings.SITE_URL}/schedule/{shop.slug}/{target_date.year}/{target_date.month}/"
-            
-            send_push_to_admin(title, body, url)
-            
-            send_push_to_admin(title, body, url, coffee_shop=shop)
\ No newline at end of file
+
+    today = timezone.localdate()
+    date_to = today + timedelta(days=(horizon or settings.STAFFING_HORIZON_DAYS) - 1)
+    gaps = understaffed_days(today, date_to, shop_registry.all())
+
+    alerted = dict(
+        ((shop_id, day), count) for shop_id, day, count in
+        StaffingAlert.objects.filter(date__gte=today, date__lte=date_to).values_list('coffee_shop_id', 'date', 'workers_count')
+    )
+    fresh = [
+        (shop, day) for shop, day in gaps
+        if day['workers_count'] < alerted.get((shop.id, day['date']), day['minimum_workers'])
+    ]
+    if dry_run:
+        return gaps, fresh
+
+    resolved = set(alerted) - {(shop.id, day['date']) for shop, day in gaps}
+    with transaction.atomic():
+        stale = Q(date__lt=today)
+        for shop_id, day in resolved:
+            stale |= Q(coffee_shop_id=shop_id, date=day)
+        StaffingAlert.objects.filter(stale).delete()
+        StaffingAlert.objects.bulk_create(
+            [StaffingAlert(coffee_shop_id=shop.id, date=day['date'], workers_count=day['workers_count']) for shop, day in fresh],
+            update_conflicts=True,
+            unique_fields=['coffee_shop', 'date'],
+            update_fields=['workers_count', 'pending', 'updated_at'],
+        )
+
+    by_shop = {}
+    for shop, day in fresh:
+        by_shop.setdefault(shop.id, (shop, []))[1].append(day)
+
+    for shop, days in by_shop.values():
+        notify_understaffed(shop, days)
+
+    return gaps, fresh
+
+def notify_understaffed(shop, days):
+    first = days[0]['date']
+    title = "Нехватка персонала"
+    dates = ", ".join(f"{d['date'].strftime('%d.%m')} ({d['workers_count']} из {d['minimum_workers']})" for d in days)
+    body = f"На {shop.name} нехватает людей: {dates}."
+    url = f"{settings.SITE_URL}/schedule/{shop.slug}/{first.year}/{first.month}/"
+
+    send_push_to_admin(title, body, url, coffee_shop=shop, topic=f"staffing:{shop.id}", with_super_admins=True)
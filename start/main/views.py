@@ -1,13 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import FileResponse, HttpResponseBadRequest, JsonResponse, HttpResponseForbidden
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.views.decorators.clickjacking import xframe_options_sameorigin
 from .models import CoffeeShop, Worker, Shift, UserProfile, ShopAdmin, ShiftRequest, PushSubscriptions, HelpItem
 from .utils import send_push_notification, send_push_to_admin
+from .schedule import get_month_days, build_availability_index, get_shift_candidates, is_day_off, parse_shift_value
 from django.urls import reverse
 from django.utils import timezone
 import json
+import asyncio
 from django.db.models import Q
-import calendar
+from django.db import transaction
 from datetime import date, timedelta, datetime
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
@@ -15,8 +19,14 @@ from django.contrib import messages
 from django.views.decorators.http import require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
 from functools import wraps
+from . import counters, exports, schedule_cache, schedule_sync
+from .broadcast import broadcaster
+from .shop_registry import shops, get_shop_or_404
+from .payroll import PayrollReport
+from .signals import shifts_changed
 from .forms import WorkerCreationForm, AssignmentForm, WorkerSelfRegistrationForm
 from django.conf import settings
+from django.core.paginator import Paginator
 
 def get_user_profile(user):
     if not user.is_authenticated:
@@ -24,54 +34,28 @@ def get_user_profile(user):
     profile, _ = UserProfile.objects.get_or_create(user=user)
     return profile
 
-def get_user_role(user):
-    if not user.is_authenticated:
-        return None
-    if user.is_superuser:
-        return 'SUPER_ADMIN'
-    
-    try:
-        return user.profile.role
-    except UserProfile.DoesNotExist:
-        UserProfile.objects.create(user=user, role='WORKER')
-        return 'WORKER'
-
-def sync_workers_experience_years(workers):
-    today = timezone.localdate()
-    to_update = []
-    for w in workers:
-        if w.sync_experience_years(as_of=today, save=False):
-            to_update.append(w)
-    if to_update:
-        Worker.objects.bulk_update(to_update, ["experience_years"])
-
 def index(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
 
     if role == 'SUPER_ADMIN':
-        cafes = list(CoffeeShop.objects.all())
-        for c in cafes:
-            c.pending_applications_count = ShiftRequest.objects.filter(shift__coffee_shop=c, status='PENDING').count()
+        cafes = counters.annotate_pending(shops.all(), counters.pending_counts())
         return render(request, 'main/index/super_admin_index.html', {'cafes': cafes})
     
     if role == 'SHOP_ADMIN':
-        admin_shops = ShopAdmin.objects.filter(user=request.user).values_list('coffee_shop_id', flat=True)
-        cafes = list(CoffeeShop.objects.filter(id__in=admin_shops))
-        for c in cafes:
-            c.pending_applications_count = ShiftRequest.objects.filter(shift__coffee_shop=c, status='PENDING').count()
+        cafes = shops.filter_ids(request.identity.admin_shop_ids)
+        counters.annotate_pending(cafes, counters.pending_counts([c.id for c in cafes]))
         return render(request, 'main/index/index.html', {'cafes': cafes, 'show_cafes': True})
 
     if not request.user.is_authenticated:
-        cafes = CoffeeShop.objects.all()
+        cafes = shops.all()
         return render(request, 'main/index/index.html', {'cafes': cafes, 'show_cafes': False})
 
     worker = Worker.objects.filter(user=request.user).first()
     show_cafes = (worker is not None and worker.coffee_shop_id is not None)
     
-    cafes = list(CoffeeShop.objects.all())
+    cafes = shops.all()
     if show_cafes:
-        for c in cafes:
-            c.pending_applications_count = ShiftRequest.objects.filter(taken_by=worker, status='AWAITING_TAKER', shift__coffee_shop=c).count()
+        counters.annotate_pending(cafes, counters.awaiting_taker_counts(worker))
     
     return render(request, 'main/index/index.html', {
         'cafes': cafes if show_cafes else [],
@@ -79,18 +63,17 @@ def index(request):
     })
 
 def get_workers(request, slug):
-    shop = get_object_or_404(CoffeeShop, slug=slug)
+    shop = get_shop_or_404(slug)
     workers = list(Worker.objects.filter(coffee_shop=shop))
-    sync_workers_experience_years(workers)
     
-    role = get_user_role(request.user)
+    role = request.identity.role
     pending_applications_count = 0
     if role in ('SHOP_ADMIN', 'SUPER_ADMIN'):
-        pending_applications_count = ShiftRequest.objects.filter(shift__coffee_shop=shop, status='PENDING').count()
+        pending_applications_count = counters.pending_counts([shop.id]).get(shop.id, 0)
     else:
         taker = getattr(request.user, 'worker_profile', None)
         if taker:
-            pending_applications_count = ShiftRequest.objects.filter(taken_by=taker, status='AWAITING_TAKER', shift__coffee_shop=shop).count()
+            pending_applications_count = counters.awaiting_taker_counts(taker, [shop.id]).get(shop.id, 0)
             
     return render(request, 'main/shops/shops.html', {
         'workers': workers, 
@@ -102,37 +85,9 @@ def get_workers(request, slug):
 
 def worker_detail(request, worker_id):
     worker = get_object_or_404(Worker, id=worker_id)
-    worker.sync_experience_years(as_of=timezone.localdate(), save=True)
-    role = get_user_role(request.user)
+    role = request.identity.role
     return render(request, 'main/workers/worker.html', {'worker': worker, 'role': role})
 
-def get_month_days(year, month):
-    num_days = calendar.monthrange(year, month)[1]
-    return [date(year, month, d) for d in range(1, num_days + 1)]
-
-def get_active_workers(shop, year, month):
-    month_start = date(year, month, 1)
-    return Worker.objects.filter(coffee_shop=shop).filter(Q(fired_at__isnull=True) | Q(fired_at__gt=month_start)).distinct()
-
-def build_schedule_rows(workers, days, shifts_by_day_worker):
-    rows = []
-    for worker in workers:
-        cells = [
-            {'date': day, 'shift': shifts_by_day_worker.get((worker.id, day))}
-            for day in days
-        ]
-        rows.append({'worker': worker, 'cells': cells})
-    return rows
-
-def get_days_with_workers_count(days, shifts_by_day_worker, shop):
-    days_info = []
-    for day in days:
-        count = sum(1 for (worker_id, shift_date), shift in shifts_by_day_worker.items() 
-                   if shift_date == day and shift is not None and 
-                   (shift.another_shop is None or shift.another_shop == shop))
-        days_info.append({'date': day, 'workers_count': count})
-    return days_info
-
 def get_month_navigation(year, month):
     if month == 1:
         prev_month, prev_year = 12, year - 1
@@ -147,45 +102,23 @@ def get_month_navigation(year, month):
     return prev_year, prev_month, next_year, next_month
 
 def schedule_view(request, slug, year=None, month=None):
-    shop = get_object_or_404(CoffeeShop, slug=slug)
-    role = get_user_role(request.user)
+    shop = get_shop_or_404(slug)
+    role = request.identity.role
 
     if role == 'SHOP_ADMIN':
-        is_assigned = ShopAdmin.objects.filter(user=request.user, coffee_shop=shop).exists()
-        if not is_assigned:
+        if shop.id not in request.identity.admin_shop_ids:
             return HttpResponseForbidden("Your not admin on this shop")
 
     today = timezone.now().date()
     year = int(year) if year else today.year
     month = int(month) if month else today.month
 
-    days = get_month_days(year, month)
-    workers = list(get_active_workers(shop, year, month))
-    sync_workers_experience_years(workers)
-    
-    shifts = Shift.objects.filter(coffee_shop=shop, date__year=year, date__month=month)
-    
-    shifts_from_other_shops = Shift.objects.filter(another_shop=shop, date__year=year, date__month=month)
-    
-    all_shifts = list(shifts) + list(shifts_from_other_shops)
-    shifts_by_day_worker = {(s.worker_id, s.date): s for s in all_shifts}
-    
-    workers_from_other_shops_ids = shifts_from_other_shops.values_list('worker_id', flat=True).distinct()
-    workers_from_other_shops = list(Worker.objects.filter(id__in=workers_from_other_shops_ids))
-    sync_workers_experience_years(workers_from_other_shops)
-    
-    all_workers = list(workers) + list(workers_from_other_shops)
-    
-    schedule_rows = build_schedule_rows(all_workers, days, shifts_by_day_worker)
-    days_info = get_days_with_workers_count(days, shifts_by_day_worker, shop)
+    version = schedule_sync.current_version(shop)
+    grid = schedule_cache.get_month_schedule(shop, year, month, min_version=version)
     prev_year, prev_month, next_year, next_month = get_month_navigation(year, month)
 
-    active_requests = ShiftRequest.objects.filter(shift__coffee_shop=shop, shift__date__year=year, shift__date__month=month, status='PENDING').select_related('shift', 'worker', 'taken_by')
-
-    requests_map = {(r.shift.worker_id, r.shift.date) for r in active_requests}
-
     my_future_shifts = []
-    available_workers_by_shift_json = "{}"
+    colleagues = []
     if role == 'WORKER':
         worker = getattr(request.user, 'worker_profile', None)
         if worker:
@@ -194,47 +127,110 @@ def schedule_view(request, slug, year=None, month=None):
                 date__gte=timezone.now().date(),
                 coffee_shop=shop
             ).order_by('date'))
-            
-            available_workers_dict = {}
-            for s in my_future_shifts:
-                working_ids = Shift.objects.filter(date=s.date).values_list('worker_id', flat=True)
-                available = Worker.objects.exclude(id=worker.id).exclude(id__in=working_ids).select_related('coffee_shop')
-                available_workers_dict[s.id] = [
-                    {
-                        'id': w.id,
-                        'name': w.name,
-                        'shop': w.coffee_shop.name if w.coffee_shop else 'Без точки'
-                    } for w in available
-                ]
-            available_workers_by_shift_json = json.dumps(available_workers_dict)
+
+            if my_future_shifts:
+                busy_by_date = build_availability_index([s.date for s in my_future_shifts])
+                workers_total = Worker.objects.exclude(id=worker.id).count()
+                for s in my_future_shifts:
+                    s.available_count = workers_total - len(busy_by_date[s.date] - {worker.id})
             
             colleagues = Worker.objects.filter(coffee_shop=shop).exclude(id=worker.id)
-    else:
-        colleagues = []
 
     return render(request, 'main/schedule/schedule.html', {
         'shop': shop,
         'role': role,
-        'days': days,
-        'days_info': days_info,
-        'workers': all_workers,
-        'schedule_rows': schedule_rows,
+        'days': grid['days'],
+        'days_info': grid['days_info'],
+        'workers': grid['workers'],
+        'schedule_rows': grid['schedule_rows'],
         'min_workers': shop.minimum_workers,
+        'version': version,
         'year': year,
         'month': month,
-        'all_shops': CoffeeShop.objects.all(),
+        'all_shops': shops.all(),
         'prev_year': prev_year,
         'prev_month': prev_month,
         'next_year': next_year,
         'next_month': next_month,
-        'requests_map':requests_map,
+        'requests_map':grid['requests_map'],
         'my_future_shifts':my_future_shifts,
         'colleagues':colleagues,
-        'available_workers_by_shift_json': available_workers_by_shift_json,
     })
 
+def schedule_data(request, slug, year, month):
+    shop = get_shop_or_404(slug)
+    role = request.identity.role
+
+    if role == 'SHOP_ADMIN':
+        if shop.id not in request.identity.admin_shop_ids:
+            return HttpResponseForbidden("Your not admin on this shop")
+
+    try:
+        get_month_days(year, month)
+        since = int(request.GET['since']) if request.GET.get('since') else None
+    except ValueError:
+        return HttpResponseBadRequest('Invalid request')
+
+    return JsonResponse(schedule_sync.schedule_payload(shop, year, month, since))
+
+SCHEDULE_STREAM_HEARTBEAT = 25
+
+def _schedule_stream_access(request, slug, year, month):
+    shop = shops.get_by_slug(slug)
+    if shop is None:
+        return None
+    role = request.identity.role
+    if role == 'SHOP_ADMIN' and shop.id not in request.identity.admin_shop_ids:
+        return None
+    return shop
+
+async def schedule_stream(request, slug, year, month):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    shop = await sync_to_async(_schedule_stream_access)(request, slug, year, month)
+    if shop is None:
+        return HttpResponseForbidden("Your not admin on this shop")
+
+    try:
+        get_month_days(year, month)
+        since = int(request.headers.get('Last-Event-ID') or request.GET['since'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Invalid request')
+
+    async def events():
+        version = since
+        subscription = broadcaster.subscribe(shop.id, year, month)
+        queue = subscription[1]
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=SCHEDULE_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    pass
+                if await sync_to_async(schedule_cache.latest_version)(shop.id) == version:
+                    yield ': ping\n\n'
+                    continue
+                payload = await sync_to_async(schedule_sync.schedule_payload)(shop, year, month, version)
+                if payload['version'] == version:
+                    yield ': ping\n\n'
+                    continue
+                version = payload['version']
+                event = 'reload' if payload['full'] else 'cells'
+                data = json.dumps(payload) if event == 'cells' else '{}'
+                yield f'id: {version}\nevent: {event}\ndata: {data}\n\n'
+        finally:
+            broadcaster.unsubscribe(shop.id, year, month, subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 @require_POST
+@transaction.atomic
 def offer_shift_exchange(request):
     shift_id = request.POST.get('shift_id')
     shift = get_object_or_404(Shift, id=int(shift_id))
@@ -270,86 +266,161 @@ def offer_shift_exchange(request):
                 title="Отказ от смены",
                 body=f"Работник {worker.name} хочет отказаться от смены {shift.date.strftime('%d.%m')} ({shift.coffee_shop.name})",
                 url=url,
-                coffee_shop=shift.coffee_shop
+                coffee_shop=shift.coffee_shop,
+                topic=f"applications:{shift.coffee_shop_id}",
             )
     
     return redirect('main:schedule', slug=shift.coffee_shop.slug, year=shift.date.year, month=shift.date.month)
 
+@login_required
+def shift_candidates(request, shift_id):
+    worker = getattr(request.user, 'worker_profile', None)
+    shift = get_object_or_404(Shift, id=shift_id)
+    if not worker or shift.worker_id != worker.id:
+        return HttpResponseForbidden('Не ваша смена')
+
+    paginator = Paginator(get_shift_candidates(shift, worker.id), 50)
+    page = paginator.get_page(request.GET.get('page'))
+    return JsonResponse({
+        'results': [
+            {
+                'id': w.id,
+                'name': w.name,
+                'shop': w.coffee_shop.name if w.coffee_shop else 'Без точки'
+            } for w in page
+        ],
+        'page': page.number,
+        'has_next': page.has_next(),
+    })
+
 @require_POST
 @csrf_protect
 def update_shift(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
     if role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         return HttpResponseForbidden("You are not admin")
 
     try:
         data = json.loads(request.body)
         worker = Worker.objects.get(id=data['worker_id'])
-        target_shop = CoffeeShop.objects.get(id=data['coffee_shop_id'])
+        target_shop = shops.get_by_id(data['coffee_shop_id'])
+        if target_shop is None:
+            raise CoffeeShop.DoesNotExist
         day = datetime.strptime(data['date'], '%Y-%m-%d').date()
         raw_value = (data.get('value') or '').strip()
 
-        if role == 'SHOP_ADMIN' and not ShopAdmin.objects.filter(user=request.user, coffee_shop=target_shop).exists():
+        if role == 'SHOP_ADMIN' and target_shop.id not in request.identity.admin_shop_ids:
             return HttpResponseForbidden("Вы не админ этой конкретной кофейни")
     except (KeyError, json.JSONDecodeError, Worker.DoesNotExist, CoffeeShop.DoesNotExist, ValueError):
         return HttpResponseBadRequest('Invalid request')
 
-    if not raw_value or raw_value.lower() in ('выходной', 'off', 'none'):
+    if is_day_off(raw_value):
         Shift.objects.filter(worker=worker, date=day).delete()
         return JsonResponse({'ok':True})
 
     if worker.coffee_shop_id != target_shop.id:
         return HttpResponseForbidden('Нельзя менять график работника в чужой кофейне')
 
-    defaults = {'coffee_shop': worker.coffee_shop, 'start_time': None, 'another_shop': None, 'is_plus': False, 'display_text':'',}
+    defaults = parse_shift_value(raw_value, shops.get_by_code)
+    defaults['coffee_shop'] = target_shop
 
-    value = raw_value
-    parsed_structured = False
+    Shift.objects.update_or_create(worker=worker, date=day, defaults=defaults)
+    return JsonResponse({'ok': True})
 
-    if '+' in value:
-        defaults['is_plus'] = True
-        value = value.replace('+','').strip()
+@require_POST
+@csrf_protect
+def bulk_update_shifts(request):
+    role = request.identity.role
+    if role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
+        return HttpResponseForbidden("You are not admin")
 
-    tokens = value.split()
-    time_part = None
-    shop_code = None
+    try:
+        cells = json.loads(request.body)['cells']
+        if not isinstance(cells, list):
+            raise ValueError
+    except (KeyError, TypeError, json.JSONDecodeError, ValueError):
+        return HttpResponseBadRequest('Invalid request')
 
-    if tokens:
-        if ':' in tokens[0]:
-            try:
-                time_part = datetime.strptime(tokens[0], '%H:%M').time()
-                parsed_structured = True
-            except ValueError:
-                time_part = None
-        else:
-            shop_code = tokens[0]
-            
-        if time_part and len(tokens) > 1:
-            shop_code = tokens[1]
+    parsed = []
+    for cell in cells:
+        try:
+            parsed.append({
+                'worker_id': int(cell['worker_id']),
+                'shop_id': int(cell['coffee_shop_id']),
+                'date': datetime.strptime(cell['date'], '%Y-%m-%d').date(),
+                'value': (cell.get('value') or '').strip(),
+            })
+        except (KeyError, TypeError, AttributeError, ValueError):
+            parsed.append(None)
 
-    if time_part:
-        defaults['start_time'] = time_part
+    valid = [c for c in parsed if c]
+    workers = Worker.objects.in_bulk({c['worker_id'] for c in valid})
+    shops_by_id = {s.id: s for s in shops.all()}
+    if role == 'SHOP_ADMIN':
+        allowed_shop_ids = request.identity.admin_shop_ids
+    else:
+        allowed_shop_ids = set(shops_by_id)
 
-    if shop_code:
-        try:
-            another_shop = CoffeeShop.objects.get(short_code=shop_code)
-            defaults['another_shop'] = another_shop
-            parsed_structured = True
-        except CoffeeShop.DoesNotExist:
-            defaults['another_shop'] = None
-
-    if not parsed_structured and not defaults['is_plus']:
-        defaults['display_text'] = raw_value
-        defaults['start_time'] = None
-        defaults['another_shop'] = None
-        defaults['is_plus'] = False
+    results = []
+    changes = {}
+    for cell in parsed:
+        if cell is None or cell['worker_id'] not in workers or cell['shop_id'] not in shops_by_id:
+            results.append({'ok': False, 'status': 400, 'error': 'Invalid request'})
+            continue
+        if cell['shop_id'] not in allowed_shop_ids:
+            results.append({'ok': False, 'status': 403, 'error': 'Вы не админ этой конкретной кофейни'})
+            continue
 
-    Shift.objects.update_or_create(worker=worker, date=day, defaults=defaults)
-    return JsonResponse({'ok': True})
+        worker = workers[cell['worker_id']]
+        if is_day_off(cell['value']):
+            fields = None
+        elif worker.coffee_shop_id != cell['shop_id']:
+            results.append({'ok': False, 'status': 403, 'error': 'Нельзя менять график работника в чужой кофейне'})
+            continue
+        else:
+            fields = parse_shift_value(cell['value'], shops.get_by_code)
+            fields['coffee_shop'] = shops_by_id[cell['shop_id']]
+
+        changes[(worker.id, cell['date'])] = fields
+        results.append({'ok': True})
+
+    if changes:
+        with transaction.atomic():
+            existing = {
+                (s.worker_id, s.date): s
+                for s in Shift.objects.filter(
+                    worker_id__in={worker_id for worker_id, _ in changes},
+                    date__in={day for _, day in changes},
+                ).select_for_update()
+            }
+            to_delete, to_update, to_create = [], [], []
+            for (worker_id, day), fields in changes.items():
+                shift = existing.get((worker_id, day))
+                if fields is None:
+                    if shift:
+                        to_delete.append(shift.id)
+                    continue
+                if shift is None:
+                    shift = Shift(worker_id=worker_id, date=day)
+                    to_create.append(shift)
+                for name, value in fields.items():
+                    setattr(shift, name, value)
+                if shift.pk and shift.changed_fields():
+                    to_update.append(shift)
+
+            if to_delete:
+                Shift.objects.filter(id__in=to_delete).delete()
+            if to_update:
+                Shift.objects.bulk_update(to_update, ['coffee_shop', 'start_time', 'another_shop', 'is_plus', 'display_text'])
+            if to_create:
+                Shift.objects.bulk_create(to_create)
+            shifts_changed(to_update + to_create)
+
+    return JsonResponse({'ok': all(r['ok'] for r in results), 'results': results})
 
 @login_required
 def assign_shop_admin(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
 
     if role != 'SUPER_ADMIN':
         return HttpResponseForbidden("Вы не админ")
@@ -386,15 +457,14 @@ def log_out(request):
 @login_required
 @require_POST
 def register_vacation(request, worker_id):
-    role = get_user_role(request.user)
+    role = request.identity.role
     if role == 'WORKER':
         return HttpResponseForbidden("Вы не админ")
 
     worker = get_object_or_404(Worker, id=worker_id)
     
     if role == 'SHOP_ADMIN':
-        admin_shop = ShopAdmin.objects.filter(user=request.user).first()
-        if not admin_shop or admin_shop.coffee_shop != worker.coffee_shop:
+        if worker.coffee_shop_id not in request.identity.admin_shop_ids:
             return HttpResponseForbidden("Вы не админ этой конкретной кофейни")
     else:
         pass
@@ -405,8 +475,8 @@ def register_vacation(request, worker_id):
     return redirect('main:worker_detail', worker.id)
 
 def shift_applications(request, slug):
-    shop = get_object_or_404(CoffeeShop, slug=slug)
-    role = get_user_role(request.user)
+    shop = get_shop_or_404(slug)
+    role = request.identity.role
     if role in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         shift_req = ShiftRequest.objects.filter(shift__coffee_shop=shop, status='PENDING').select_related('worker', 'shift', 'taken_by')
         context = {'role': role, 'shift_req': shift_req, 'shop': shop}
@@ -422,6 +492,7 @@ def shift_applications(request, slug):
 
 @login_required
 @require_POST
+@transaction.atomic
 def accept_application(request):
     id = request.POST.get('application_id')
     app = get_object_or_404(ShiftRequest, id=id)
@@ -476,9 +547,10 @@ def accept_application(request):
 
 @login_required
 @require_POST
+@transaction.atomic
 def confirm_take_shift(request):
     id = request.POST.get('application_id')
-    role = get_user_role(request.user)
+    role = request.identity.role
     app = get_object_or_404(ShiftRequest, id=id)
     action = request.POST.get('action')
     
@@ -492,7 +564,8 @@ def confirm_take_shift(request):
             title="Запрос на замену",
             body=f"Работник {app.taken_by.name} согласился взять смену вместо {app.worker.name} на {app.shift.date.strftime('%d.%m') if app.shift else ''}. Ожидает вашего подтверждения.",
             url=url,
-            coffee_shop=app.shift.coffee_shop if app.shift else None
+            coffee_shop=app.shift.coffee_shop if app.shift else None,
+            topic=f"applications:{app.shift.coffee_shop_id}" if app.shift else "applications",
         )
     else:
         app.status = 'REJECTED'
@@ -512,6 +585,7 @@ def confirm_take_shift(request):
 
 @login_required
 @require_POST
+@transaction.atomic
 def reject_application(request):
     id = request.POST.get('application_id')
     app = get_object_or_404(ShiftRequest, id=id)
@@ -538,7 +612,7 @@ def reject_application(request):
 
 @login_required
 def statistics(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
     if role != 'SUPER_ADMIN' and role != 'SHOP_ADMIN':
         return HttpResponseForbidden('Не админ')
 
@@ -553,77 +627,69 @@ def statistics(request):
         date_from = today.replace(day=1)
         date_to = today
 
-    shifts = (Shift.objects.select_related('worker', 'coffee_shop', 'another_shop').filter(date__gte=date_from, date__lte=date_to))
+    report = PayrollReport.build(date_from, date_to)
 
-    PLUS_BONUS = 500
-    
-    shifts_by_worker = {}
-    for shift in shifts:
-        if getattr(shift, 'display_text', '').strip():
-            continue
-        shifts_by_worker.setdefault(shift.worker_id, []).append(shift)
+    return render(request, 'main/statistics/statistics.html', {'stats':report.stats, 'report':report, 'date_from':date_from, 'date_to':date_to})
 
-    shops = CoffeeShop.objects.prefetch_related('workers')
+def _export_scope(request):
+    role = request.identity.role
+    if role not in ('SUPER_ADMIN', 'SHOP_ADMIN'):
+        return HttpResponseForbidden('Не админ')
 
-    stats = []
-    for shop in shops:
-        workers_data = []
-        for worker in shop.workers.all():
-            worker_shifts = shifts_by_worker.get(worker.id, [])
-            if not worker_shifts:
-                continue
+    fmt = request.GET.get('format', 'csv')
+    try:
+        date_from = datetime.strptime(request.GET['from'], "%Y-%m-%d").date()
+        date_to = datetime.strptime(request.GET['to'], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Invalid request')
+    if fmt not in exports.FORMATS or date_from > date_to:
+        return HttpResponseBadRequest('Invalid request')
 
-            shifts_count = len(worker_shifts)
-            plus_count = sum(1 for s in worker_shifts if getattr(s, 'is_plus', False))
-            
-            shop_breakdown = {}
-            for s in worker_shifts:
-                shop_code = (s.another_shop.short_code if s.another_shop else s.coffee_shop.short_code)
-                shop_breakdown[shop_code] = shop_breakdown.get(shop_code, 0) + 1
-            
-            breakdown_parts = [f"{count} {code}" for code, count in shop_breakdown.items()]
-            if plus_count > 0:
-                plus_str = "+" * plus_count
-                breakdown_parts.append(f"({plus_str})")
-            
-            breakdown_display = " + ".join(breakdown_parts)
-
-            rate = worker.get_hourly_rate(as_of=date_to)
-            total_salary = 0
-            if worker.start_date_experience_years:
-                days = (date_to - worker.start_date_experience_years).days
-                half_year_period = max(0, days // worker.HALF_YEAR)
-                experience_bonus = half_year_period * 100
-            else:
-                experience_bonus = 0
-
-            for s in worker_shifts:
-                base_shop = s.another_shop or s.coffee_shop
-                if not base_shop:
-                    continue
-                base_rate = base_shop.hourly_rate + experience_bonus
-                if getattr(s, 'is_plus', False):
-                    base_rate += PLUS_BONUS
-                total_salary += base_rate
-
-            workers_data.append({
-                'worker': worker,
-                'rate': rate,
-                'shifts_count': shifts_count,
-                'plus_shifts_count': plus_count,
-                'breakdown': breakdown_display,
-                'total_salary': total_salary,
-            })
-        if workers_data:
-            stats.append({'shop':shop, 'workers':workers_data})
+    selected = shops.all()
+    if request.GET.get('shop'):
+        shop = shops.get_by_slug(request.GET['shop'])
+        if shop is None:
+            return HttpResponseBadRequest('Invalid request')
+        selected = [shop]
+    if role == 'SHOP_ADMIN':
+        selected = [s for s in selected if s.id in request.identity.admin_shop_ids]
+        if not selected:
+            return HttpResponseForbidden('Вы не админ этой конкретной кофейни')
+    return date_from, date_to, fmt, selected
+
+def _export_response(rows, fmt, filename, sheet_name):
+    response = StreamingHttpResponse(exports.stream(rows, fmt, sheet_name), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
 
-    return render(request, 'main/statistics/statistics.html', {'stats':stats, 'date_from':date_from, 'date_to':date_to})
+@login_required
+def export_schedule(request):
+    scope = _export_scope(request)
+    if isinstance(scope, HttpResponse):
+        return scope
+    date_from, date_to, fmt, selected = scope
+    rows = exports.schedule_rows(selected, date_from, date_to)
+    return _export_response(rows, fmt, f'schedule_{date_from}_{date_to}', 'График')
+
+@login_required
+def export_payroll(request):
+    scope = _export_scope(request)
+    if isinstance(scope, HttpResponse):
+        return scope
+    date_from, date_to, fmt, selected = scope
+    shop_ids = [s.id for s in selected]
+    if request.GET.get('detail'):
+        rows = exports.payroll_entry_rows(date_from, date_to, shop_ids)
+    else:
+        rows = exports.payroll_rows(date_from, date_to, shop_ids)
+    return _export_response(rows, fmt, f'payroll_{date_from}_{date_to}', 'Зарплата')
 
 def register_view(request):
     if request.method == 'POST':
         form = WorkerSelfRegistrationForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             return redirect('main:index')
     else:
         form = WorkerSelfRegistrationForm()
@@ -633,18 +699,19 @@ def register_view(request):
 
 @login_required
 def pending_registrations(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
     if role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         return HttpResponseForbidden('Не админ')
     
     pending_workers = Worker.objects.filter(coffee_shop__isnull=True)
-    cafes = CoffeeShop.objects.all()
+    cafes = shops.all()
     return render(request, 'main/admin/pending_workers.html', {'pending_workers':pending_workers, 'cafes':cafes})
 
 @login_required
 @require_POST
+@transaction.atomic
 def approve_worker(request, worker_id):
-    if get_user_role(request.user) not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
+    if request.identity.role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         return HttpResponseForbidden('Вы не админ')
 
     worker = get_object_or_404(Worker, id=worker_id)
@@ -669,7 +736,7 @@ def approve_worker(request, worker_id):
 @login_required
 @require_POST
 def reject_worker(request, worker_id):
-    if get_user_role(request.user) not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
+    if request.identity.role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         return HttpResponseForbidden('Вы не админ')
 
     worker = get_object_or_404(Worker, id=worker_id)
@@ -691,12 +758,14 @@ def save_push_subscription(request):
             'user': request.user,
             'auth': data['keys']['auth'],
             'p256dh': data['keys']['p256dh'],
+            'failure_count': 0,
+            'retry_after': None,
         })
     return JsonResponse({'ok': True})
 
 @login_required
 def help_view(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
     items = HelpItem.objects.all()
     
     categories = {
@@ -716,7 +785,7 @@ def help_view(request):
 
 @login_required
 def manage_help_item(request, pk=None):
-    if get_user_role(request.user) not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
+    if request.identity.role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         return HttpResponseForbidden("Доступ запрещен")
         
     item = get_object_or_404(HelpItem, pk=pk) if pk else None
@@ -759,7 +828,7 @@ def update_worker_photo(request):
         return JsonResponse({'ok': False, 'error': 'Missing data'}, status=400)
     
     worker = get_object_or_404(Worker, id=worker_id)
-    user_role = get_user_role(request.user)
+    user_role = request.identity.role
     
     is_admin = user_role in ('SUPER_ADMIN', 'SHOP_ADMIN')
     is_owner = worker.user == request.user
@@ -783,7 +852,7 @@ def delete_worker_photo(request):
         return JsonResponse({'ok': False, 'error': 'Missing worker_id'}, status=400)
     
     worker = get_object_or_404(Worker, id=worker_id)
-    user_role = get_user_role(request.user)
+    user_role = request.identity.role
     
     is_admin = user_role in ('SUPER_ADMIN', 'SHOP_ADMIN')
     is_owner = worker.user == request.user
@@ -799,7 +868,7 @@ def delete_worker_photo(request):
 @login_required
 @require_POST
 def delete_help_item(request, pk):
-    if get_user_role(request.user) not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
+    if request.identity.role not in ('SHOP_ADMIN', 'SUPER_ADMIN'):
         return HttpResponseForbidden("Доступ запрещен")
         
     item = get_object_or_404(HelpItem, pk=pk)
@@ -809,7 +878,7 @@ def delete_help_item(request, pk):
 @login_required
 @require_POST
 def add_shop(request):
-    role = get_user_role(request.user)
+    role = request.identity.role
     if role != 'SUPER_ADMIN':
         return HttpResponseForbidden("Только супер-админ может добавлять кофейни")
         
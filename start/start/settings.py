@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 from decouple import config
 
@@ -26,6 +27,8 @@ SECRET_KEY = config('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=False, cast=bool)
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1,*').split(',')
 
 CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', default='https://*.ngrok-free.app,https://*.ngrok.io,https://*.ngrok-free.dev').split(',')
@@ -56,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.middleware.IdentityMiddleware',
     'main.middleware.LoginRequiredMiddleware'
 ]
 
@@ -103,6 +107,24 @@ if config('DB_ENGINE', default='') == 'django.db.backends.postgresql':
         'PORT': config('DB_PORT', default='5432'),
     }
 
+# Identity, schedule and shop caches are invalidated through cache keys, so every
+# worker process has to see the same cache. Per-process backends are only allowed
+# with DEBUG and in the test runner (see main.checks).
+LOCAL_CACHE = DEBUG or TESTING
+
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache' if LOCAL_CACHE else 'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='' if LOCAL_CACHE else str(BASE_DIR / '.cache')),
+    }
+}
+
+SCHEDULE_CACHE_TIMEOUT = config('SCHEDULE_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+SCHEDULE_CHANGE_RETENTION_DAYS = config('SCHEDULE_CHANGE_RETENTION_DAYS', default=7, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -157,6 +179,21 @@ WEBPUSH_ADMIN_EMAIL = config('WEBPUSH_ADMIN_EMAIL')
 
 SITE_URL = config('SITE_URL', default='http://localhost:8000')
 
+STAFFING_HORIZON_DAYS = config('STAFFING_HORIZON_DAYS', default=14, cast=int)
+STAFFING_ALERT_DEBOUNCE = config('STAFFING_ALERT_DEBOUNCE', default=60, cast=int)
+
+PUSH_DELIVERY_WORKERS = config('PUSH_DELIVERY_WORKERS', default=8, cast=int)
+PUSH_MAX_ATTEMPTS = config('PUSH_MAX_ATTEMPTS', default=6, cast=int)
+PUSH_RETRY_BASE = config('PUSH_RETRY_BASE', default=30, cast=int)
+PUSH_COALESCE_WINDOW = config('PUSH_COALESCE_WINDOW', default=30, cast=int)
+PUSH_SUBSCRIPTION_MAX_FAILURES = config('PUSH_SUBSCRIPTION_MAX_FAILURES', default=10, cast=int)
+PUSH_SUBSCRIPTION_STALE_DAYS = config('PUSH_SUBSCRIPTION_STALE_DAYS', default=30, cast=int)
+PUSH_FAILED_RETENTION_DAYS = config('PUSH_FAILED_RETENTION_DAYS', default=7, cast=int)
+PUSH_CLAIM_TIMEOUT = config('PUSH_CLAIM_TIMEOUT', default=300, cast=int)
+
+SCHEDULER_LEASE_TTL = config('SCHEDULER_LEASE_TTL', default=60, cast=int)
+SCHEDULER_MISFIRE_GRACE_TIME = config('SCHEDULER_MISFIRE_GRACE_TIME', default=60 * 60 * 6, cast=int)
+
 
 # Production Security
 if not DEBUG: